@@ -0,0 +1,61 @@
+import threading
+import cv2
+import numpy as np
+
+class ScreenBackend:
+  """Screen capture and mouse input that FindMy drives the Find My app through"""
+  def capture(self, region:tuple[int, int, int, int], reuse:bool=False) -> np.ndarray:
+    """RGB pixels of region (left, top, width, height) as a (height, width, 3) uint8 array.
+    With reuse the array may be a buffer the next capture of the same region overwrites, for frames that aren't kept"""
+    raise NotImplementedError
+  def click(self, x:int, y:int): raise NotImplementedError
+  def move_to(self, x:int, y:int): raise NotImplementedError
+  def scroll(self, units:int):
+    """Scroll at the mouse position, positive units scroll up"""
+    raise NotImplementedError
+  def position(self) -> tuple[int, int]: raise NotImplementedError
+
+class PyAutoGuiBackend(ScreenBackend):
+  """The real screen and mouse, through pyautogui"""
+  def __init__(self):
+    import pyautogui # Needs a display, only import it when driving a real screen
+    self.pyautogui = pyautogui
+
+  def capture(self, region:tuple[int, int, int, int], reuse:bool=False) -> np.ndarray:
+    return np.array(self.pyautogui.screenshot(region=tuple(region)))
+  def click(self, x:int, y:int): self.pyautogui.click(x, y)
+  def move_to(self, x:int, y:int): self.pyautogui.moveTo(x, y)
+  def scroll(self, units:int): self.pyautogui.scroll(units)
+  def position(self) -> tuple[int, int]:
+    x, y = self.pyautogui.position()
+    return x, y
+
+class MssBackend(PyAutoGuiBackend):
+  """Captures with mss (X11 shared memory, Quartz or GDI) straight into NumPy buffers, input through pyautogui"""
+  def __init__(self):
+    super().__init__()
+    import mss
+    self.mss = mss
+    self.local = threading.local() # mss handles can only be used on the thread that made them
+    self.buffers:dict[tuple, np.ndarray] = {} # region -> reusable RGB buffer
+
+  def capture(self, region:tuple[int, int, int, int], reuse:bool=False) -> np.ndarray:
+    if not hasattr(self.local, "sct"): self.local.sct = self.mss.mss()
+    left, top, width, height = region = tuple(region)
+    shot = self.local.sct.grab({"left": left, "top": top, "width": width, "height": height})
+    bgra = np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4) # No copy
+    if shot.width != width or shot.height != height: # HiDPI screens capture more pixels than screen points
+      bgra = cv2.resize(bgra, (width, height), interpolation=cv2.INTER_AREA)
+    out = None
+    if reuse:
+      out = self.buffers.get(region)
+      if out is None: out = self.buffers[region] = np.empty((height, width, 3), np.uint8)
+    return cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=out)
+
+def create_backend(name:str="auto") -> ScreenBackend:
+  """Backend for the real screen: mss, pyautogui, or auto (mss when installed)"""
+  if name in ("auto", "mss"):
+    try: return MssBackend()
+    except ImportError:
+      if name == "mss": raise
+  return PyAutoGuiBackend()
@@ -0,0 +1,282 @@
+"""Benchmarks indexing, selection and screenshot sweeps against the simulator or recorded frames.
+
+  python benchmark.py                      simulator at 50, 200 and 1000 friends, stub OCR
+  python benchmark.py --ocr tesseract      real OCR of the simulated list
+  python benchmark.py --replay DIR         build_index over frames recorded with --record DIR
+  python benchmark.py --record DIR         record build_index frames from the real screen
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import cv2
+import numpy as np
+
+import findmy
+from findmy import FindMy
+from backends import ScreenBackend, create_backend
+from simulator import SimulatedFindMy
+from imaging import segment_rows, crop_row, image_hash
+from metrics import configure_logging, STEP_SECONDS
+
+class StageTimer:
+  """Adds up time spent in wrapped functions, per stage"""
+  def __init__(self):
+    self.totals:dict[str, float] = {}
+    self.counts:dict[str, int] = {}
+
+  def wrap(self, stage:str, function):
+    def timed(*args, **kwargs):
+      started_at = time.perf_counter()
+      try: return function(*args, **kwargs)
+      finally:
+        self.totals[stage] = self.totals.get(stage, 0.0) + time.perf_counter() - started_at
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+    return timed
+
+  def wrap_attribute(self, owner, name:str, stage:str):
+    """Time owner.name from now on, where owner is an instance or a module"""
+    setattr(owner, name, self.wrap(stage, getattr(owner, name)))
+
+  def add(self, stage:str, seconds:float, count:int=1):
+    self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+    self.counts[stage] = self.counts.get(stage, 0) + count
+
+  def reset(self):
+    self.totals.clear()
+    self.counts.clear()
+
+  def report(self) -> dict[str, dict]:
+    return { stage: {"seconds": round(seconds, 4), "calls": self.counts[stage]} for stage, seconds in sorted(self.totals.items(), key=lambda item: -item[1]) }
+
+class RecordingBackend(ScreenBackend):
+  """Passes everything to another backend, saving each capture in order for ReplayBackend"""
+  def __init__(self, inner:ScreenBackend, directory:str):
+    self.inner = inner
+    self.directory = directory
+    self.count = 0
+    os.makedirs(directory, exist_ok=True)
+
+  def capture(self, region, reuse=False):
+    img = self.inner.capture(region)
+    left, top, width, height = region
+    cv2.imwrite(os.path.join(self.directory, f"{self.count:05d}_{left}_{top}_{width}_{height}.png"), cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+    self.count += 1
+    return img
+  def click(self, x, y): self.inner.click(x, y)
+  def move_to(self, x, y): self.inner.move_to(x, y)
+  def scroll(self, units): self.inner.scroll(units)
+  def position(self): return self.inner.position()
+
+class ReplayBackend(ScreenBackend):
+  """Plays recorded captures back in order, per region. Input is ignored, so runs must ask for frames in the recorded order"""
+  def __init__(self, directory:str):
+    self.frames:dict[tuple, list[str]] = {}
+    for filename in sorted(os.listdir(directory)):
+      if not filename.endswith(".png"): continue
+      region = tuple(int(v) for v in os.path.splitext(filename)[0].split("_")[1:])
+      self.frames.setdefault(region, []).append(os.path.join(directory, filename))
+    self.positions = { region: 0 for region in self.frames }
+    self.mouse = (0, 0)
+
+  def capture(self, region, reuse=False):
+    region = tuple(region)
+    paths = self.frames[region]
+    path = paths[min(self.positions[region], len(paths) - 1)] # The last frame repeats once the recording runs out
+    self.positions[region] += 1
+    return cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+  def click(self, x, y): self.mouse = (x, y)
+  def move_to(self, x, y): self.mouse = (x, y)
+  def scroll(self, units): pass
+  def position(self): return self.mouse
+
+def stub_ocr(sim:SimulatedFindMy):
+  """OCR oracle for the simulator's list rows, to time everything but tesseract"""
+  binary = FindMy.filter_text_color(sim.list_image)
+  padded = np.vstack([np.zeros((1, binary.shape[1]), np.uint8), binary]) # So the first row isn't treated as cut off
+  rows = segment_rows(padded)
+  if len(rows) != len(sim.names): raise RuntimeError(f"Found {len(rows)} rows for {len(sim.names)} names, can't build the OCR oracle")
+  lookup = { image_hash(crop_row(binary, top - 1, bottom - 1)): name for (top, bottom), name in zip(rows, sim.names) }
+  return lambda row: lookup.get(image_hash(row), "")
+
+def name_accuracy(expected:list[str], indexed:list[str]) -> dict:
+  expected = { FindMy.clean_name(name) for name in expected }
+  indexed = set(indexed)
+  found = len(expected & indexed)
+  return {"expected": len(expected), "found": found, "missed": len(expected) - found, "wrong": len(indexed - expected),
+          "accuracy": round(found / len(expected), 4) if expected else None}
+
+def make_findmy(backend:ScreenBackend, config:dict, timer:StageTimer) -> FindMy:
+  with open(findmy.CONFIG_FILE, "w") as f: json.dump(config, f) # Read by FindMy like a config from setup
+  bot = FindMy(backend)
+  # Pool workers are sent ocr_row by name, a wrapper can't be pickled. Pooled OCR shows up as ocr_wait instead
+  if config.get("ocr_workers") in (0, 1): timer.wrap_attribute(findmy, "ocr_row", "ocr")
+  timer.wrap_attribute(bot, "filter_text_color", "filter_text_color")
+  timer.wrap_attribute(bot, "wait_for_map_settle", "map_waits")
+  timer.wrap_attribute(bot, "save_index", "save_index")
+  timer.wrap_attribute(bot, "save_friend", "save_index")
+  timer.wrap_attribute(backend, "capture", "capture")
+  return bot
+
+def span_totals(step:str) -> tuple[float, int]:
+  """Seconds and count recorded so far for a findmy_step_seconds step"""
+  with STEP_SECONDS.lock: counts = list(STEP_SECONDS.series.get((step,), ()))
+  return (counts[-1], sum(counts[:-1])) if counts else (0.0, 0)
+
+def run_stage(timer:StageTimer, scrolls_before:int, scrolls_after, function, *args) -> tuple[object, dict]:
+  """Run one benchmarked step, returns its result and timings. scrolls_after counts scrolls so far, for the scroll wait estimate"""
+  timer.reset()
+  waited_before = span_totals("ocr_wait")
+  started_at = time.perf_counter()
+  result = function(*args)
+  wall = time.perf_counter() - started_at
+  waited, waits = (after - before for after, before in zip(span_totals("ocr_wait"), waited_before))
+  if waits: timer.add("ocr_wait (pool)", waited, waits)
+  if scrolls_after() > scrolls_before: timer.add("scroll_waits (estimated)", (scrolls_after() - scrolls_before) * findmy.SCROLL_WAIT, scrolls_after() - scrolls_before)
+  return result, {"wall": round(wall, 3), "stages": timer.report()}
+
+def benchmark_simulator(friends:int, args, timer:StageTimer) -> dict:
+  sim = SimulatedFindMy(friends, pixels_per_unit=args.pixels_per_unit, render_latency=args.render_latency, map_latency=args.map_latency, seed=args.seed)
+  config = {**sim.regions(), "screenshot_dir": "screenshots", "ocr_workers": args.ocr_workers}
+  if args.ocr == "stub":
+    findmy.ocr_row = stub_ocr(sim)
+    config["ocr_workers"] = 0 # The oracle only exists in this process
+  bot = make_findmy(sim, config, timer)
+  scrolls = lambda: sim.stats["scrolls"]
+  results = {"friends": friends}
+
+  if not args.no_calibrate:
+    _, results["calibrate_scroll"] = run_stage(timer, scrolls(), scrolls, bot.calibrate_scroll)
+  summary, results["build_index"] = run_stage(timer, scrolls(), scrolls, bot.build_index)
+  results["build_index"]["summary"] = summary
+  results["build_index"]["names"] = name_accuracy(sim.names, list(bot.friends_index))
+  summary, results["build_index_warm"] = run_stage(timer, scrolls(), scrolls, bot.build_index)
+  results["build_index_warm"]["summary"] = summary
+
+  # Selection, timed per lookup and click and checked against what the simulator selected
+  rng = random.Random(args.seed)
+  targets = rng.sample(sim.names, min(args.selections, len(sim.names)))
+  lookup_started = time.perf_counter()
+  keys = [bot.find_friend(name) for name in targets]
+  lookup_time = time.perf_counter() - lookup_started
+  def select_all():
+    correct = 0
+    for name, key in zip(targets, keys):
+      if key and bot.click_friend(key, True) and sim.selected == name: correct += 1
+    return correct
+  correct, results["click_friend"] = run_stage(timer, scrolls(), scrolls, select_all)
+  results["click_friend"]["selections"] = len(targets)
+  results["click_friend"]["correct"] = correct
+  results["click_friend"]["per_selection"] = round(results["click_friend"]["wall"] / max(1, len(targets)), 3)
+  results["find_friend"] = {"lookups": len(targets), "per_lookup_us": round(lookup_time / max(1, len(targets)) * 1e6, 1)}
+
+  # Sweep, what screenshot_all does, over a sample of the list in list order
+  sweep = [key for key in (bot.find_friend(name) for name in sim.names[:: max(1, len(sim.names) // args.sweep)][:args.sweep]) if key]
+  def capture_and_flush():
+    captured = bot.capture_friends(sweep)
+    for filename in [result["screenshot"] for result in captured.values() if result["screenshot"]]: bot.wait_for_screenshot(filename)
+    return captured
+  captured, results["screenshot_all"] = run_stage(timer, scrolls(), scrolls, capture_and_flush)
+  results["screenshot_all"]["friends"] = len(sweep)
+  results["screenshot_all"]["errors"] = sum(1 for result in captured.values() if result["error"])
+  results["screenshot_all"]["per_friend"] = round(results["screenshot_all"]["wall"] / max(1, len(sweep)), 3)
+  bot.shutdown()
+  return results
+
+def benchmark_replay(args, timer:StageTimer) -> dict:
+  backend = ReplayBackend(args.replay)
+  config_path = os.path.join(args.replay, "config.json")
+  config = {}
+  if os.path.exists(config_path):
+    with open(config_path, "r") as f: config = json.load(f)
+  config["ocr_workers"] = args.ocr_workers
+  bot = make_findmy(backend, config, timer)
+  summary, results = run_stage(timer, 0, lambda: 0, bot.build_index)
+  results["summary"] = summary
+  names_path = os.path.join(args.replay, "names.txt") # Expected names, one per line, for accuracy
+  if os.path.exists(names_path):
+    with open(names_path, "r") as f: results["names"] = name_accuracy([line.strip() for line in f if line.strip()], list(bot.friends_index))
+  bot.shutdown()
+  return {"replay": args.replay, "build_index": results}
+
+def record(args):
+  directory = os.path.abspath(args.record)
+  bot = FindMy(RecordingBackend(create_backend(), directory))
+  with open(os.path.join(directory, "config.json"), "w") as f: json.dump(bot.config, f, indent=2)
+  print("Recording build_index in 3 seconds, switch to the Find My app window.")
+  time.sleep(3)
+  bot.build_index()
+  bot.shutdown()
+  print(f"Recorded {bot.backend.count} frames to {directory}")
+
+def print_results(results:dict):
+  for run in results["runs"]:
+    title = f"{run['friends']} friends" if "friends" in run else f"replay {run['replay']}"
+    print(f"\n== {title} ==")
+    for step, data in run.items():
+      if not isinstance(data, dict) or "wall" not in data: continue
+      extras = { key: value for key, value in data.items() if key not in ("wall", "stages", "summary") }
+      print(f"{step:<18} {data['wall']:>9.3f}s  {json.dumps(extras) if extras else ''}")
+      for stage, timing in data["stages"].items():
+        print(f"  {stage:<26} {timing['seconds']:>9.3f}s  x{timing['calls']}")
+    if "find_friend" in run: print(f"{'find_friend':<18} {run['find_friend']['per_lookup_us']:>8.1f}us per lookup")
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark FindMy indexing, selection and screenshot sweeps")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="Simulated list lengths")
+  parser.add_argument("--ocr", choices=["stub", "tesseract"], default="stub", help="stub times everything except tesseract")
+  parser.add_argument("--ocr-workers", type=int, default=None, help="OCR processes with --ocr tesseract, None = one per core")
+  parser.add_argument("--selections", type=int, default=20, help="Random friends to select per size")
+  parser.add_argument("--sweep", type=int, default=20, help="Friends captured in the screenshot sweep per size")
+  parser.add_argument("--pixels-per-unit", type=float, default=2.5, help="Simulated list scroll per scroll unit")
+  parser.add_argument("--render-latency", type=float, default=0.0, help="Simulated seconds before a scroll shows")
+  parser.add_argument("--map-latency", type=float, default=0.3, help="Simulated seconds before a selected friend's map shows")
+  parser.add_argument("--no-calibrate", action="store_true", help="Index with the uncalibrated scroll step")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--replay", help="Directory of frames recorded with --record, benchmarks build_index over them")
+  parser.add_argument("--record", help="Record build_index frames from the real screen into this directory")
+  parser.add_argument("--json", help="Also write the results to this file")
+  parser.add_argument("--keep", action="store_true", help="Keep the scratch directory with indexes and screenshots")
+  parser.add_argument("--verbose", action="store_true", help="Show FindMy's own log output")
+  args = parser.parse_args()
+  configure_logging("DEBUG" if args.verbose else "WARNING")
+  if args.record: return record(args)
+  if args.replay: args.replay = os.path.abspath(args.replay)
+  json_path = os.path.abspath(args.json) if args.json else None
+
+  # Index, caches and screenshots go to a scratch directory, away from the real ones
+  workdir = tempfile.mkdtemp(prefix="findmy-benchmark-")
+  cwd = os.getcwd()
+  os.chdir(workdir)
+  findmy.CONFIG_FILE = os.path.join(workdir, "config.json")
+  timer = StageTimer()
+  timer.wrap_attribute(findmy, "encode_image", "encoding")
+  results = {"ocr": args.ocr, "runs": []}
+  try:
+    run_benchmarks(args, timer, results, workdir)
+  finally:
+    os.chdir(cwd)
+    if not args.keep: shutil.rmtree(workdir, ignore_errors=True)
+  print_results(results)
+  if json_path:
+    with open(json_path, "w") as f: json.dump(results, f, indent=2)
+
+def run_benchmarks(args, timer:StageTimer, results:dict, workdir:str):
+  if args.replay: results["runs"].append(benchmark_replay(args, timer))
+  else:
+    for size in args.sizes:
+      print(f"Benchmarking {size} friends...", file=sys.stderr)
+      ocr_row = findmy.ocr_row
+      results["runs"].append(benchmark_simulator(size, args, timer))
+      findmy.ocr_row = ocr_row # Undo the stub and the timing wrapper
+      for filename in os.listdir(workdir): # Each size starts cold
+        path = os.path.join(workdir, filename)
+        if os.path.isdir(path): shutil.rmtree(path)
+        else: os.remove(path)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import math
+import bisect
+import threading
+import logging
+from string import Formatter
+from metrics import span
+
+log = logging.getLogger(__name__)
+
+class InvalidCursor(ValueError):
+  """A query cursor that no previous page could have returned"""
+
+class ScreenshotCatalog:
+  """In-memory index of a screenshot folder, by time and by friend.
+  Persisted between runs, so startup only stats files added since the last save"""
+  def __init__(self, directory:str, filename_format:str, path:str, read_only:bool=False):
+    self.directory = directory
+    self.path = path
+    self.read_only = read_only # Loads the saved catalog but never writes it, for read-only replicas
+    self.pattern = self.filename_pattern(filename_format)
+    self.lock = threading.Lock()
+    self.entries:dict[str, tuple[str|None, float, int]] = {} # filename -> (friend, mtime, size)
+    self.by_time:list[tuple[float, str]] = [] # (mtime, filename), oldest first
+    self.by_friend:dict[str, list[tuple[float, str]]] = {}
+    self.total_bytes = 0 # Sum of file sizes, files sharing a stored object each count in full
+    self.dir_mtime:float = None # Folder mtime when entries were last known to match it
+
+  @staticmethod
+  def filename_pattern(filename_format:str) -> re.Pattern:
+    """Regex matching names made from filename_format, with the friend's name as the name group"""
+    stem = os.path.splitext(filename_format)[0] # Extension follows the screenshot format
+    pattern = ""
+    for literal, field, _, _ in Formatter().parse(stem):
+      pattern += re.escape(literal)
+      if field == "name": pattern += r"(?P<name>.+?)"
+      elif field == "timestamp": pattern += r"\d{8}_\d{6}"
+      elif field is not None: pattern += r".+?"
+    return re.compile(pattern + r"\.\w+$")
+
+  def parse_friend(self, filename:str) -> str | None:
+    match = self.pattern.match(filename)
+    return match.group("name") if match and "name" in self.pattern.groupindex else None
+
+  def add(self, filename:str, friend:str=None, mtime:float=None, size:int=None):
+    """Record a screenshot, replacing any earlier entry with the same name"""
+    if mtime is None or size is None:
+      stat = os.stat(os.path.join(self.directory, filename))
+      mtime, size = stat.st_mtime, stat.st_size
+    if friend is None: friend = self.parse_friend(filename)
+    with self.lock:
+      self._remove(filename)
+      self.entries[filename] = (friend, mtime, size)
+      self.total_bytes += size
+      bisect.insort(self.by_time, (mtime, filename))
+      if friend is not None: bisect.insort(self.by_friend.setdefault(friend, []), (mtime, filename))
+
+  def remove(self, filename:str):
+    with self.lock: self._remove(filename)
+
+  def _remove(self, filename:str):
+    entry = self.entries.pop(filename, None)
+    if not entry: return
+    friend, mtime, size = entry
+    self.total_bytes -= size
+    self.by_time.pop(bisect.bisect_left(self.by_time, (mtime, filename)))
+    if friend is not None:
+      times = self.by_friend[friend]
+      times.pop(bisect.bisect_left(times, (mtime, filename)))
+      if not times: del self.by_friend[friend]
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.by_time.clear()
+      self.by_friend.clear()
+      self.total_bytes = 0
+
+  def filenames(self) -> list[str]:
+    with self.lock: return list(self.entries)
+
+  def oldest_first(self) -> list[tuple[str, str|None, float, int]]:
+    """(filename, friend, mtime, size) of every screenshot, oldest first"""
+    with self.lock: return [(filename, *self.entries[filename]) for _, filename in self.by_time]
+
+  def __contains__(self, filename:str): return filename in self.entries
+  def __len__(self): return len(self.entries)
+
+  def query(self, friend:str=None, since:float=None, until:float=None, limit:int=100, cursor:str=None) -> tuple[list[tuple[str, float]], str|None, int]:
+    """Newest first page of (filename, mtime) taken at since <= mtime <= until.
+    cursor comes from the previous page, returns the page, the next cursor (None on the last page) and the match count"""
+    if cursor: cursor_mtime, cursor_name = self.parse_cursor(cursor)
+    with self.lock:
+      times = self.by_time if friend is None else self.by_friend.get(friend, [])
+      low = bisect.bisect_left(times, (since, "")) if since is not None else 0
+      high = bisect.bisect_right(times, (until, "\uffff")) if until is not None else len(times)
+      total = max(0, high - low)
+      if cursor: high = min(high, bisect.bisect_left(times, (cursor_mtime, cursor_name)))
+      start = max(low, high - limit)
+      page = [(filename, mtime) for mtime, filename in reversed(times[start:high])]
+    next_cursor = f"{page[-1][1]!r}:{page[-1][0]}" if page and start > low else None
+    return page, next_cursor, total
+
+  @staticmethod
+  def parse_cursor(cursor:str) -> tuple[float, str]:
+    """(mtime, filename) of a cursor made by query"""
+    mtime, separator, filename = cursor.partition(":")
+    try: mtime = float(mtime)
+    except ValueError: raise InvalidCursor(f"Invalid cursor '{cursor}'") from None
+    if not separator or not math.isfinite(mtime): raise InvalidCursor(f"Invalid cursor '{cursor}'")
+    return mtime, filename
+
+  def refresh(self):
+    """Bring the catalog in line with the folder, only statting files it doesn't know yet"""
+    if not os.path.isdir(self.directory):
+      self.clear()
+      return
+    dir_mtime = os.stat(self.directory).st_mtime
+    if dir_mtime == self.dir_mtime: return # No files added or removed since
+    seen = set()
+    for entry in os.scandir(self.directory):
+      if entry.name.startswith(".") or not entry.is_file(): continue # Object store, thumbnails
+      seen.add(entry.name)
+      if entry.name not in self.entries:
+        stat = entry.stat()
+        self.add(entry.name, mtime=stat.st_mtime, size=stat.st_size)
+    for filename in self.filenames():
+      if filename not in seen: self.remove(filename)
+    self.dir_mtime = dir_mtime
+    self.save()
+
+  def load(self) -> bool:
+    if not os.path.exists(self.path): return False
+    try:
+      with open(self.path, "r") as f: data = json.load(f)
+    except (OSError, ValueError):
+      log.warning("Screenshot catalog unreadable, rebuilding")
+      return False
+    if data.get("directory") != os.path.abspath(self.directory): return False
+    entries = data.get("entries", {})
+    if any(len(entry) != 3 for entry in entries.values()): return False # Saved before sizes were tracked
+    with self.lock:
+      self.entries = { filename: (friend, mtime, size) for filename, (friend, mtime, size) in entries.items() }
+      self.total_bytes = sum(size for _, _, size in self.entries.values())
+      self.by_time = sorted((mtime, filename) for filename, (_, mtime, _) in self.entries.items())
+      self.by_friend = {}
+      for mtime, filename in self.by_time:
+        friend = self.entries[filename][0]
+        if friend is not None: self.by_friend.setdefault(friend, []).append((mtime, filename))
+    self.dir_mtime = data.get("dir_mtime")
+    return True
+
+  def save(self):
+    if self.read_only: return
+    with self.lock: data = {"directory": os.path.abspath(self.directory), "dir_mtime": self.dir_mtime, "entries": dict(self.entries)}
+    with span("catalog_save"):
+      tmp_path = self.path + ".tmp"
+      with open(tmp_path, "w") as f: json.dump(data, f)
+      os.replace(tmp_path, self.path)
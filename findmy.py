@@ -1,77 +1,394 @@
+from __future__ import annotations # numpy types in annotations don't import numpy
 import time
-import pyautogui
-import pytesseract
-from pytesseract import Output
 import os
 import json
-import cv2
-import numpy as np
 from datetime import datetime
 import re
+from types import MappingProxyType
+from collections import deque
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from index_store import IndexStore
+from catalog import ScreenshotCatalog
+from locations import LocationStore
+from names import NameIndex, match_names
+from metrics import span, STEP_SECONDS, configure_logging
+from typing import TYPE_CHECKING
+# cv2, numpy, imaging, ocr and backends are imported where they're used. Serving the index and
+# screenshots never loads them, the GUI/OCR stack comes in with the first GUI job
+if TYPE_CHECKING:
+  import numpy as np
+  from backends import ScreenBackend
+  from ocr import OCRCache
 
 MAX_SCROLLS = 50
 SCROLL_LENGTH = 30
 SCROLL_WAIT = 0.1
 
+log = logging.getLogger(__name__)
+
 CONFIG_FILE = "config.json"
 CACHE_FILE = "friends_index.json"
+OCR_CACHE_FILE = os.path.join(os.path.dirname(CACHE_FILE), "ocr_cache.json")
+CATALOG_FILE = os.path.join(os.path.dirname(CACHE_FILE), "screenshot_catalog.json")
+LOCATIONS_DIR = os.path.join(os.path.dirname(CACHE_FILE), "locations") # Pin position history per friend
 
 DEFAULT_CONFIG = {
     "friends_list_region": None,  # (left, top, width, height)
     "map_region": None,  # (left, top, width, height)
     "people_button": None,  # (x, y)
     "index_stale_time": 14400,  # 4 hours
+    # Built-in capture scheduler, keeps screenshots fresh without clients calling screenshot_all
+    "scheduler_enabled": False,
+    "refresh_interval": 3600,  # Default seconds between captures of a friend, Friend.refresh_interval overrides it
+    "scheduler_gui_share": 0.5,  # Most of the GUI's time scheduled work may take, the rest is left for interactive requests
+    "scheduler_batch": 5,  # Friends captured per scheduled job, smaller jobs give way to other work sooner
+    "scheduler_tick": 10,  # Seconds between scheduler checks
     "ocr_language": "eng",
+    "ocr_psm": 7,  # Tesseract page segmentation mode for each list row, 7 = single text line
+    "ocr_whitelist": None,  # Characters tesseract may return, None = any
+    "fuzzy_name_edits": 1,  # Edits allowed when matching names with OCR errors, more starts matching other people
+    "ocr_workers": None,  # OCR processes used while indexing, None = one per core, 0 or 1 = serial
+    "ocr_cache_size": 5000,  # Rows kept in the OCR cache
+    "list_still_threshold": 1.0,  # Mean pixel change below which the list is considered to have stopped scrolling
+    "list_end_wait": 0.5,  # Seconds an unchanged frame is re-captured for before it counts as the end of the list, covers slow redraws
+    "capture_backend": "auto",  # Screen capture: mss, pyautogui, or auto (mss when installed)
+    "scroll_pixels_per_unit": None,  # Measured list scroll per scroll unit, None = not calibrated
+    "index_scroll_fraction": 0.75,  # Share of the list viewport moved per indexing scroll once calibrated
     "access_token": None,
-    "map_load_delay": 4.0,
+    "map_load_delay": 4.0,  # Longest wait for the map after selecting a friend
+    "map_settle_interval": 0.2,  # Seconds between map samples while waiting for it to settle
+    "map_settle_frames": 2,  # Consecutive unchanged samples that count as settled
+    "map_settle_min": 1.0,  # Wait at least this long if the map never visibly reacts to the click
+    "map_still_threshold": 0.5,  # Mean pixel change below which two map samples count as unchanged
     "screenshot_dir": "screenshots",
-    "filename_format": "{name}_{timestamp}.png"
+    "filename_format": "{name}_{timestamp}.png",
+    "screenshot_skip_unchanged": True,  # Keep the previous file when a capture is pixel for pixel the same, False = always save
+    "screenshot_format": "png",  # png, webp or jpeg
+    "screenshot_quality": 90,  # 0-100, for webp and jpeg
+    "encoder_workers": 2,  # Threads encoding screenshots in the background
+    # Pin localization, off unless a template or colour range is set
+    "pin_template": None,  # Path to a cropped image of a friend's map pin
+    "pin_hsv_range": None,  # [[h, s, v], [h, s, v]] colour range of the pin (OpenCV HSV, h 0-179), used without a template
+    "pin_min_score": 0.5,  # Template match score or blob roundness (0-1) below which no pin is recorded
+    "index_flush_interval": 2.0,  # Seconds friend updates are buffered before being appended to the index journal
+    "index_compact_after": 500,  # Journal entries after which the journal is folded back into the index file
+    # Retention, every rule is off when None, a friend's latest screenshot is never deleted
+    "retention_keep_per_friend": None,  # Newest screenshots kept per friend
+    "retention_max_age": None,  # Seconds
+    "retention_max_bytes": None,  # Budget for screenshot_dir, oldest screenshots go first when over it
+    "retention_thinning": None,  # [[age, interval], ...] past age (seconds) keep one screenshot per interval per friend, e.g. [[86400, 3600], [604800, 86400]]
+    "retention_interval": 3600,  # Seconds between retention passes
+    "retention_batch_size": 100,  # Files deleted per batch
+    "retention_batch_pause": 0.5,  # Seconds between batches
+    "log_level": "INFO",  # DEBUG also logs every indexed row, click and map wait
+    "read_only_refresh_interval": 5  # Seconds between checks for index and screenshot changes in read-only mode
+}
+
+OBJECTS_DIR = ".objects" # Content addressed screenshot store inside screenshot_dir
+THUMBS_DIR = ".thumbs" # Cached thumbnails inside screenshot_dir, one folder per size
+THUMBNAIL_SIZES = (128, 256, 512, 1024) # Requested sizes snap up to one of these to bound the cache
+
+# format: (file extension, mimetype)
+SCREENSHOT_FORMATS = {
+  "png": (".png", "image/png"),
+  "webp": (".webp", "image/webp"),
+  "jpeg": (".jpg", "image/jpeg"),
 }
+MIMETYPES = { ext: mimetype for ext, mimetype in SCREENSHOT_FORMATS.values() }
+MIMETYPES[".jpeg"] = "image/jpeg"
+
+def encode_image(rgb:np.ndarray, ext:str, quality:int=90) -> bytes:
+  """Encode an RGB image for the given file extension"""
+  import cv2
+  params = []
+  if ext == ".webp": params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+  elif ext in (".jpg", ".jpeg"): params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+  ok, data = cv2.imencode(ext, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), params)
+  if not ok: raise ValueError(f"Could not encode image as {ext}")
+  return data.tobytes()
+
+class TaskCancelled(Exception):
+  """Raised from GUI work when the task driving it was cancelled or timed out"""
+
+def ocr_row(row:np.ndarray) -> str:
+  """OCR a single segmented list row. Module level so it can run in the indexing process pool"""
+  from ocr import get_ocr_engine
+  return get_ocr_engine().image_to_string(row).strip()
 
 class Friend:
-  def __init__(self, name:str, scrolls:int, y:int):
+  def __init__(self, name:str, scrolls:int, y:int, offset:int=None):
     self.name:str = name
     self.scrolls:int = scrolls
     self.y:int = y
+    self.offset:int|None = offset # Pixels from the top of the whole list to the row's center
 
     self.last_screenshot:str = None
     self.last_screenshot_at:float = None
+    self.last_screenshot_hash:str = None # Content hash of last_screenshot's pixels
+    self.refresh_interval:float|None = None # Seconds between scheduled captures, None = config default
   def to_dict(self):
     return {
       "name": self.name,
       "last_screenshot": self.last_screenshot,
       "last_screenshot_at": self.last_screenshot_at,
+      "last_screenshot_hash": self.last_screenshot_hash,
+      "refresh_interval": self.refresh_interval,
       "scrolls": self.scrolls,
-      "y": self.y
+      "y": self.y,
+      "offset": self.offset
     }
   @staticmethod
   def from_dict(data:dict):
-    friend = Friend(data["name"], data["scrolls"], data["y"])
+    friend = Friend(data["name"], data["scrolls"], data["y"], data.get("offset", None))
     friend.last_screenshot = data.get("last_screenshot", None)
     friend.last_screenshot_at = data.get("last_screenshot_at", None)
+    friend.last_screenshot_hash = data.get("last_screenshot_hash", None)
+    friend.refresh_interval = data.get("refresh_interval", None)
     return friend
-  def __repr__(self): return f"Friend(name={self.name}, scrolls={self.scrolls}, y={self.y})"
+  def __repr__(self): return f"Friend(name={self.name}, scrolls={self.scrolls}, y={self.y}, offset={self.offset})"
+
+class IndexSnapshot:
+  """Read-only copy of the friends index. A new one replaces the old whenever the index changes,
+  so readers on other threads never see a half updated index and never need a lock"""
+  __slots__ = ("version", "membership_version", "last_sync", "friends", "by_name")
+  def __init__(self, version:int, last_sync:str|None, friends:tuple[MappingProxyType, ...], membership_version:int=0):
+    self.version = version
+    self.membership_version = membership_version # Last version that added, removed or reordered friends
+    self.last_sync = last_sync
+    self.friends = friends # Friend.to_dict() records plus the version they last changed at, in list order
+    self.by_name = MappingProxyType({ friend["name"]: friend for friend in friends })
+  def changed_since(self, since:int) -> list[MappingProxyType] | None:
+    """Records changed after version since, None when a full list is needed instead"""
+    if since < self.membership_version or since > self.version: return None
+    return [friend for friend in self.friends if friend["version"] > since]
 
 class FindMy:
-  def __init__(self):
+  def __init__(self, backend:ScreenBackend=None, read_only:bool=False):
+    self._backend = backend
+    self.read_only = read_only # Serve the index and screenshots from disk only, never drive the GUI or change them
     self.friends_index:dict[str, Friend] = {}
+    self.snapshot = IndexSnapshot(0, None, ())
+    self.name_index = NameIndex(())
     self.selected_friend:str = None
     self.currently_selected_friend:str|None = None
     self.config = DEFAULT_CONFIG.copy()
     self.last_sync = None
+    self.scroll_step:int = SCROLL_LENGTH # Units per indexing scroll, replayed by click_friend
+    self.list_max_offset:int|None = None # How far the list can scroll, in pixels
+    self.list_position:int|None = None # Scroll units the list is currently scrolled down, None = unknown
+    self.map_wait_times:dict[str, deque[float]] = {} # Recent map settle waits per friend
+    self.list_full_steps:int|None = None # Indexing steps that moved a full step, past them the list hit the bottom
+    self.ocr_pool:ProcessPoolExecutor = None
+    self.ocr_pool_size:int = 0
+    self.ocr_pool_settings:tuple = None
+    self.ocr_cache:OCRCache = None
+    self.encoder_pool:ThreadPoolExecutor = None
+    self.encode_lock = threading.Lock()
+    self.pending_screenshots:dict[str, Future] = {} # filename -> encode job still writing it
+    self.pending_objects:dict[str, Future] = {} # object path -> encode job writing it
+    self.object_users:dict[str, int] = {} # object path -> queued screenshots still to link it, kept from pruning
+    self.hard_links:dict[str, bool] = {} # objects dir -> whether it supports hard links
+    self.screenshot_catalog:ScreenshotCatalog = None
+    self.location_store = LocationStore(LOCATIONS_DIR)
+    self.pin_template:np.ndarray = None
+    self.pin_template_path:str = None
+    self.cancel_event:threading.Event = None # Set by whoever runs GUI tasks, checked between GUI steps
+    self.yield_hook = None # Called between friends in long sweeps, lets more urgent GUI work run
+    self.progress_callback = None # Receives progress events (dicts) from the running GUI task
     self.load_config()
+    self.index_store = IndexStore(CACHE_FILE, self.config["index_flush_interval"], self.config["index_compact_after"])
+    self.index_store.compact = self.save_index
   
+  @property
+  def backend(self) -> ScreenBackend:
+    """Screen and mouse the app is driven through, created on first use"""
+    if self._backend is None:
+      if self.read_only: raise RuntimeError("Read-only mode can't drive the GUI")
+      from backends import create_backend
+      self._backend = create_backend(self.config["capture_backend"])
+    return self._backend
+
+  def report_progress(self, event:dict):
+    if self.progress_callback: self.progress_callback(event)
+
+  def check_cancelled(self):
+    """Stop GUI work here if the running task was cancelled"""
+    if self.cancel_event and self.cancel_event.is_set(): raise TaskCancelled("Task cancelled")
+
   # Mouse controls
   def mouse_to_list(self):
-    pyautogui.moveTo(self.config["friends_list_region"][0] + 10, self.config["friends_list_region"][1] + 10)
+    self.backend.move_to(self.config["friends_list_region"][0] + 10, self.config["friends_list_region"][1] + 10)
   def scroll_to_top(self):
     self.mouse_to_list()
+    # Strokes long enough to cover the whole list once its length is measured
+    units = 600
+    pixels_per_unit = self.config["scroll_pixels_per_unit"]
+    if pixels_per_unit and self.list_max_offset: units = max(units, int(self.list_max_offset / pixels_per_unit) + 1)
+    self.list_position = None # Unknown until the last stroke is done, a cancel mid-way re-homes next time
     for _ in range(3):
-        pyautogui.scroll(600)
-        time.sleep(SCROLL_WAIT)
+        self.check_cancelled()
+        self.scroll_list(units)
+    self.list_position = 0
+  def scroll_list(self, units:int):
+    """Scroll at the mouse and wait for the list to redraw"""
+    with span("scroll"):
+      self.backend.scroll(units)
+      time.sleep(SCROLL_WAIT)
+  def click(self, x:int, y:int):
+    with span("click"): self.backend.click(x, y)
+  def invalidate_list_position(self):
+    """Forget where the list is scrolled to, the next selection re-homes to the top"""
+    self.list_position = None
+
+  def capture(self, region:str, reuse:bool=False) -> np.ndarray:
+    """Capture a configured region (friends_list_region or map_region)"""
+    with span("capture"): return self.backend.capture(self.config[region], reuse=reuse)
+
+  def capture_list(self) -> np.ndarray:
+    """Binarized capture of the friends list region"""
+    return self.filter_text_color(self.capture("friends_list_region", reuse=True))
+
+  def calibrate_scroll(self, samples:int=3) -> float | None:
+    """Measure how many pixels the list moves per scroll unit, by matching consecutive frames.
+    Saves the result to the config, returns None if the list is too short to measure"""
+    import numpy as np
+    from imaging import estimate_shift
+    log.info("Calibrating scroll distance...")
+    def measure(units:int) -> list[float]:
+      self.scroll_to_top()
+      prev = self.capture_list()
+      rates = []
+      for _ in range(samples):
+        self.check_cancelled()
+        self.mouse_to_list()
+        self.scroll_list(-units)
+        cur = self.capture_list()
+        shift = estimate_shift(prev, cur)
+        if not shift: break # Unmatched or end of list
+        rates.append(shift / units)
+        prev = cur
+      return rates
+
+    # Rough rate from small steps, then measured again at the step size indexing will use
+    rates = measure(SCROLL_LENGTH)
+    if not rates:
+      log.warning("Could not measure scrolling, is the list long enough?")
+      return None
+    step = max(1, int(self.config["friends_list_region"][3] * self.config["index_scroll_fraction"] / np.median(rates)))
+    rates = measure(step) or rates
+    pixels_per_unit = float(np.median(rates))
+    self.config["scroll_pixels_per_unit"] = pixels_per_unit
+    self.save_config()
+    self.invalidate_list_position()
+    log.info(f"Scroll calibrated: {pixels_per_unit:.3f} pixels per unit")
+    return pixels_per_unit
+
+  def index_scroll_step(self) -> int:
+    """Scroll units per indexing step, close to a full viewport once calibrated"""
+    pixels_per_unit = self.config["scroll_pixels_per_unit"]
+    if not pixels_per_unit: return SCROLL_LENGTH
+    return max(1, int(self.config["friends_list_region"][3] * self.config["index_scroll_fraction"] / pixels_per_unit))
+
+  def map_signature(self) -> np.ndarray:
+    from imaging import frame_signature
+    return frame_signature(self.capture("map_region", reuse=True))
+
+  def wait_for_map_settle(self, before:np.ndarray=None) -> float:
+    """Wait until the map stops changing, capped at map_load_delay. Returns seconds waited.
+    before is the map signature from before the click, to tell when the map has reacted"""
+    with span("map_settle"): return self._wait_for_map_settle(before)
+
+  def _wait_for_map_settle(self, before:np.ndarray) -> float:
+    from imaging import signature_diff
+    threshold = self.config["map_still_threshold"]
+    started_at = time.time()
+    changed = before is None
+    stable = 0
+    prev = before
+    while True:
+      self.check_cancelled()
+      time.sleep(self.config["map_settle_interval"])
+      waited = time.time() - started_at
+      if waited >= self.config["map_load_delay"]: break
+      cur = self.map_signature()
+      if not changed and signature_diff(cur, before) >= threshold: changed = True
+      if prev is not None and signature_diff(cur, prev) < threshold: stable += 1
+      else: stable = 0
+      prev = cur
+      if stable >= self.config["map_settle_frames"] and (changed or waited >= self.config["map_settle_min"]): break
+    return time.time() - started_at
+
+  def record_map_wait(self, name:str, waited:float):
+    self.map_wait_times.setdefault(name, deque(maxlen=50)).append(round(waited, 3))
+
+  def map_wait_stats(self) -> dict:
+    """Distribution of recent map settle waits, overall and per friend"""
+    import numpy as np
+    def summarize(waits) -> dict:
+      waits = np.array(waits)
+      return {
+        "count": len(waits),
+        "mean": round(float(waits.mean()), 3),
+        "p50": round(float(np.percentile(waits, 50)), 3),
+        "p90": round(float(np.percentile(waits, 90)), 3),
+        "max": round(float(waits.max()), 3)
+      }
+    # Copied in one step each, the GUI thread may be recording waits meanwhile
+    waits_by_friend = { name: list(waits) for name, waits in list(self.map_wait_times.items()) }
+    all_waits = [w for waits in waits_by_friend.values() for w in waits]
+    return {
+      "cap": self.config["map_load_delay"],
+      "overall": summarize(all_waits) if all_waits else None,
+      "friends": { name: {"waits": waits, **summarize(waits)} for name, waits in waits_by_friend.items() }
+    }
+
+  def ocr_settings(self) -> tuple:
+    return (self.config["ocr_language"], self.config["ocr_psm"], self.config["ocr_whitelist"])
+
+  def get_ocr_pool(self) -> ProcessPoolExecutor | None:
+    """Get the OCR worker pool, None when indexing should run serially"""
+    from ocr import configure_ocr_engine
+    workers = self.config["ocr_workers"]
+    if workers is None: workers = os.cpu_count() or 1
+    if workers <= 1:
+      configure_ocr_engine(*self.ocr_settings()) # Serial OCR uses this process's engine
+      return None
+    if self.ocr_pool and self.ocr_pool_settings != self.ocr_settings(): self.shutdown()
+    if not self.ocr_pool:
+      # Each worker loads its own tesseract instance once and keeps it for every frame
+      self.ocr_pool = ProcessPoolExecutor(max_workers=workers, initializer=configure_ocr_engine, initargs=self.ocr_settings())
+      self.ocr_pool_size = workers
+      self.ocr_pool_settings = self.ocr_settings()
+    return self.ocr_pool
+
+  def get_ocr_cache(self) -> OCRCache:
+    from ocr import OCRCache
+    if not self.ocr_cache or self.ocr_cache.settings != list(self.ocr_settings()):
+      self.ocr_cache = OCRCache(OCR_CACHE_FILE, self.config["ocr_cache_size"], self.ocr_settings())
+      self.ocr_cache.load()
+    return self.ocr_cache
 
-  def build_index(self):
-    print("Building Friends index (OCR scan)...")
+  def shutdown(self):
+    """Stop background workers, waiting for screenshots still being written, and write out buffered updates"""
+    if self.encoder_pool:
+      self.encoder_pool.shutdown(wait=True)
+      self.encoder_pool = None
+    self.index_store.flush()
+    if self.screenshot_catalog: self.screenshot_catalog.save()
+    if self.ocr_pool:
+      self.ocr_pool.shutdown(cancel_futures=True)
+      self.ocr_pool = None
+
+  def build_index(self) -> dict:
+    """Rebuild the friends index by scrolling through the list, returns a build summary"""
+    with span("build_index"): return self._build_index()
+
+  def _build_index(self) -> dict:
+    from imaging import segment_rows, crop_row, image_hash, frame_signature, signature_diff, estimate_shift
+    log.info("Building Friends index (OCR scan)...")
+    started_at = time.time()
     
     # Save current friends data before clearing
     saved_friends_data = {}
@@ -79,201 +396,592 @@ class FindMy:
       saved_friends_data[friend_name] = {
         'last_screenshot': friend.last_screenshot,
         'last_screenshot_at': friend.last_screenshot_at,
+        'last_screenshot_hash': friend.last_screenshot_hash,
+        'refresh_interval': friend.refresh_interval,
         'name': friend.name
       }
-    print(f"Saved metadata for {len(saved_friends_data)} existing friends")
+    log.debug(f"Saved metadata for {len(saved_friends_data)} existing friends")
     
     self.scroll_to_top()
     # Ensure no one is selected by clicking 'People' button
-    pyautogui.click(self.config["people_button"][0], self.config["people_button"][1])
+    self.click(self.config["people_button"][0], self.config["people_button"][1])
+    self.invalidate_list_position()
     time.sleep(1.0)  # Wait a bit for UI to update
 
-    self.friends_index.clear()
+    # Built on the side and swapped in when complete, readers keep the old index until then
+    new_index:dict[str, Friend] = {}
     self.currently_selected_friend = None
     seen_names = set()
     scroll_count = 0 # We keep track so we can replay the scrolls later
     scrolls_without_new_names = 0 # To detect end of list
 
-    for attempt in range(MAX_SCROLLS):
-      img = pyautogui.screenshot(region=self.config["friends_list_region"])
-      filtered = self.filter_text_color(img)
-      data = pytesseract.image_to_data(filtered, output_type=Output.DICT)
-
-      current_line = []
-      last_top = None
+    def merge_frame(scrolls:int, frame_offset:int|None, rows:list[tuple[int, str, str | Future]]) -> bool:
+      """Add a frame's OCR'd rows to the index, returns True once the end of the list is reached"""
+      nonlocal scrolls_without_new_names
       new_names_this_scroll = 0
-
-      def process_current_line():
-        nonlocal last_top, current_line, new_names_this_scroll
-        if not current_line: return
-        if not last_top: return
-        raw_name = " ".join(current_line)
-        name = self.clean_name(raw_name)
-        if not name or name in seen_names: return
-        screen_y = self.config["friends_list_region"][1] + last_top
-        self.friends_index[name] = Friend(name, scroll_count, screen_y)
+      for row_y, key, text in rows:
+        if isinstance(text, Future):
+          with span("ocr_wait"): text = text.result() # Capture loop blocked on the OCR pool
+          ocr_cache.put(key, text)
+          in_flight.pop(key, None)
+        name = self.clean_name(text)
+        if not name or name in seen_names: continue
+        screen_y = self.config["friends_list_region"][1] + row_y
+        offset = frame_offset + row_y if frame_offset is not None else None
+        new_index[name] = Friend(name, scrolls, screen_y, offset)
         seen_names.add(name)
         new_names_this_scroll += 1
-        print(f"Indexed: {name} scrolls={scroll_count} y={screen_y}")
-
-      for i, word in enumerate(data["text"]):
-        word = word.strip()
-        if not word: continue
-        top = data["top"][i]
-        # Check if same line (within 12 pixels)
-        if last_top is None or abs(top - last_top) < 12:
-          current_line.append(word)
-        else:
-          # New line detected, process accumulated line
-          process_current_line()
-          current_line = [word]
-        last_top = top
+        log.debug(f"Indexed: {name} scrolls={scrolls} y={screen_y} offset={offset}")
+        self.report_progress({"type": "indexed", "name": name, "count": len(new_index)})
 
-      # Process last line if any
-      process_current_line()
-    
       # Early termination logic
       if new_names_this_scroll == 0:
         scrolls_without_new_names += 1
-        print(f"No new names found (attempt {scrolls_without_new_names}/2)")
+        log.debug(f"No new names found (attempt {scrolls_without_new_names}/2)")
         if scrolls_without_new_names >= 2:
-          print("No new names after 2 scrolls - stopping early")
-          break
+          log.info("No new names after 2 scrolls - stopping early")
+          return True
       else:
         scrolls_without_new_names = 0  # Reset counter
-      
+      return False
+
+    # Rows are found from the projection profile of the filtered frame and OCR'd one by one.
+    # Consecutive frames overlap, so most rows are cache hits and never reach tesseract.
+    # With a pool the capture loop only scrolls and grabs frames, row OCR runs in the workers
+    # and frames are merged back in scroll order as they complete
+    pool = self.get_ocr_pool()
+    ocr_cache = self.get_ocr_cache()
+    cache_hits = ocr_cache.hits
+    rows_ocrd = 0
+    in_flight:dict[str, Future] = {} # Same row seen again before its OCR finished
+    max_in_flight = self.ocr_pool_size * 2 if pool else 0
+    pending:deque[tuple[int, list]] = deque()
+    end_of_list = False
+    list_stopped = False # Frame unchanged after a scroll, so we are at the bottom
+    last_signature = None
+    frames = 0
+    # Frames are stitched into list coordinates by measuring how far each scroll actually moved
+    scroll_step = self.index_scroll_step()
+    pixels_per_unit = self.config["scroll_pixels_per_unit"]
+    frame_offset = 0
+    last_binary = None
+    step_shifts:list[int|None] = []
+
+    def read_rows(binary:np.ndarray) -> list[tuple[int, str, str | Future]]:
+      nonlocal rows_ocrd
+      rows = []
+      for top, bottom in segment_rows(binary):
+        row = crop_row(binary, top, bottom)
+        key = image_hash(row)
+        text = ocr_cache.get(key)
+        if text is None: text = in_flight.get(key)
+        if text is None:
+          rows_ocrd += 1
+          if pool:
+            text = in_flight[key] = pool.submit(ocr_row, row)
+            # Pool OCR time includes time queued for a worker
+            text.add_done_callback(lambda _, submitted_at=time.perf_counter(): STEP_SECONDS.observe(time.perf_counter() - submitted_at, "ocr"))
+          else:
+            with span("ocr"): text = ocr_row(row)
+            ocr_cache.put(key, text)
+        rows.append(((top + bottom) // 2, key, text))
+      return rows
+
+    def frame_ready(rows:list) -> bool:
+      return all(not isinstance(text, Future) or text.done() for _, _, text in rows)
+
+    for attempt in range(MAX_SCROLLS):
+      if self.cancel_event and self.cancel_event.is_set():
+        for future in in_flight.values(): future.cancel() # The old index stays in place
+        self.check_cancelled()
+      frame = self.capture("friends_list_region", reuse=True) # Only kept as its binarized copy
+      frames += 1
+      signature = frame_signature(frame)
+      still = last_signature is not None and signature_diff(signature, last_signature) < self.config["list_still_threshold"]
+      # An unchanged frame may just be a list slow to redraw, look again before taking it as the bottom
+      waited = 0.0
+      while still and waited < self.config["list_end_wait"]:
+        self.check_cancelled()
+        time.sleep(SCROLL_WAIT)
+        waited += SCROLL_WAIT
+        frame = self.capture("friends_list_region", reuse=True)
+        frames += 1
+        signature = frame_signature(frame)
+        still = signature_diff(signature, last_signature) < self.config["list_still_threshold"]
+      if still:
+        log.info("List stopped moving - stopping without OCR")
+        list_stopped = True
+        break
+      last_signature = signature
+      binary = self.filter_text_color(frame)
+      if last_binary is not None and frame_offset is not None:
+        shift = estimate_shift(last_binary, binary)
+        if shift is None and pixels_per_unit: shift = round(scroll_step * pixels_per_unit)
+        frame_offset = frame_offset + shift if shift is not None else None
+        step_shifts.append(shift)
+      last_binary = binary
+      pending.append((scroll_count, frame_offset, read_rows(binary)))
+      while pending and not end_of_list and (frame_ready(pending[0][2]) or len(pending) > max_in_flight):
+        end_of_list = merge_frame(*pending.popleft())
+      if end_of_list: break
+
       self.mouse_to_list()
-      pyautogui.scroll(-SCROLL_LENGTH)
+      self.scroll_list(-scroll_step)
       scroll_count += 1
-      time.sleep(SCROLL_WAIT)
+
+    # Frames still in flight are merged in order, unless the end was already found
+    while pending and not end_of_list:
+      end_of_list = merge_frame(*pending.popleft())
+    for future in in_flight.values(): future.cancel()
+    ocr_cache.save()
+    list_full_steps = None
+    if step_shifts and None not in step_shifts:
+      full_shift = max(step_shifts)
+      list_full_steps = next((i for i, shift in enumerate(step_shifts) if shift < full_shift), len(step_shifts))
+
+    # Without frame differencing the loop only stops after 2 full passes without new names,
+    # each one a screenshot, OCR, scroll and wait
+    cycles_saved = max(0, 2 - scrolls_without_new_names) if list_stopped and not end_of_list else 0
+    summary = {
+      "friends": len(new_index),
+      "frames": frames,
+      "rows_ocrd": rows_ocrd,
+      "ocr_cache_hits": ocr_cache.hits - cache_hits,
+      "stop_reason": "list_stopped" if list_stopped else "no_new_names" if end_of_list else "max_scrolls",
+      "cycles_saved": cycles_saved,
+    }
+    log.info(f"OCR cache: {summary['ocr_cache_hits']} hits, {rows_ocrd} rows OCR'd")
+    log.info(f"Stopped by {summary['stop_reason']} after {frames} frames, saved {cycles_saved} scroll/OCR cycles")
     
-    # Restore saved metadata - for exact name matches only unfortunately
-    n = 0
-    for friend_name, friend in self.friends_index.items():
-      if friend_name in saved_friends_data:
-        n += 1
-        friend.last_screenshot = saved_friends_data[friend_name]['last_screenshot']
-        friend.last_screenshot_at = saved_friends_data[friend_name]['last_screenshot_at']
-    print(f"Restored metadata for {n} friends from previous index")
+    # Restore saved metadata, also for names OCR read slightly differently this time
+    matches = match_names(saved_friends_data, new_index, self.config["fuzzy_name_edits"])
+    for friend_name, old_name in matches.items():
+      friend = new_index[friend_name]
+      friend.last_screenshot = saved_friends_data[old_name]['last_screenshot']
+      friend.last_screenshot_at = saved_friends_data[old_name]['last_screenshot_at']
+      friend.last_screenshot_hash = saved_friends_data[old_name]['last_screenshot_hash']
+      friend.refresh_interval = saved_friends_data[old_name]['refresh_interval']
+    fuzzy = sum(friend_name != old_name for friend_name, old_name in matches.items())
+    log.info(f"Restored metadata for {len(matches)} friends from previous index ({fuzzy} by close name match)")
 
+    self.friends_index = new_index
+    self.last_sync = datetime.now().isoformat()
+    self.scroll_step = scroll_step
+    self.list_max_offset = frame_offset
+    self.list_full_steps = list_full_steps
+    self.invalidate_list_position()
+    self.publish_snapshot()
     self.save_index()
-    print(f"Indexed {len(self.friends_index)} friends at {self.last_sync}")
+    summary["duration"] = round(time.time() - started_at, 3)
+    log.info(f"Indexed {len(self.friends_index)} friends at {self.last_sync}")
+    return summary
+
+  def publish_snapshot(self, changed:list[str]=None):
+    """Publish the index for readers, reusing unchanged records when only some friends changed"""
+    previous = self.snapshot
+    version = previous.version + 1
+    def record(friend:Friend) -> MappingProxyType:
+      old = previous.by_name.get(friend.name)
+      if old is not None and changed is not None and friend.name not in changed: return old
+      data = friend.to_dict()
+      if old is not None and changed is None and all(old[key] == value for key, value in data.items()): return old
+      return MappingProxyType({**data, "version": version})
+    friends = tuple(record(friend) for friend in list(self.friends_index.values()))
+    same_members = [friend["name"] for friend in friends] == [friend["name"] for friend in previous.friends]
+    membership_version = previous.membership_version if same_members else version
+    if not same_members or not self.name_index: self.name_index = NameIndex(self.friends_index, self.config["fuzzy_name_edits"])
+    self.snapshot = IndexSnapshot(version, self.last_sync, friends, membership_version)
 
   def load_index(self) -> bool:
-    if os.path.exists(CACHE_FILE):
-      with open(CACHE_FILE, "r") as f:
-        cache_data:dict = json.load(f)
-        if(not cache_data or "friends_index" not in cache_data):
-          print("No valid cache data found.")
-          return False
-        self.friends_index = { name: Friend.from_dict(friend_data) for name, friend_data in cache_data.get("friends_index", {}).items() }
-        self.last_sync = cache_data.get("last_sync", None)
-        print(f"Loaded index with {len(self.friends_index)} friends from cache.")
-        return True
-    else:
-      print("No cache file found.")
+    try: cache_data = self.index_store.load()
+    except (OSError, ValueError) as e:
+      log.warning(f"Cache file unreadable: {e}")
+      return False
+    if cache_data is None:
+      log.info("No cache file found.")
       return False
+    if(not cache_data or "friends_index" not in cache_data):
+      log.warning("No valid cache data found.")
+      return False
+    self.friends_index = { name: Friend.from_dict(friend_data) for name, friend_data in cache_data.get("friends_index", {}).items() }
+    self.last_sync = cache_data.get("last_sync", None)
+    self.scroll_step = cache_data.get("scroll_step", SCROLL_LENGTH)
+    self.list_max_offset = cache_data.get("list_max_offset", None)
+    self.list_full_steps = cache_data.get("list_full_steps", None)
+    # Carry the version on across restarts, so clients only ever see it increase.
+    # Reloads (read-only mode) keep the records that didn't change, so clients still get deltas
+    previous = self.snapshot
+    self.snapshot = IndexSnapshot(max(previous.version, cache_data.get("version", 0)), self.last_sync, previous.friends, previous.membership_version)
+    self.publish_snapshot()
+    if self.index_store.needs_compaction and not self.read_only: self.save_index()
+    log.info(f"Loaded index with {len(self.friends_index)} friends from cache.")
+    return True
 
   def click_friend(self, name:str, force_click=False):
     """Click on friend, with option to skip if already selected"""
-    key = None
-    for ind_name in self.friends_index:
-      if name.lower() in ind_name.lower():
-        key = ind_name
-        break
-
+    key = self.find_friend(name)
     if not key: return False # Not found
 
     # Check if this friend is already selected
     if not force_click and self.currently_selected_friend == key:
-      print(f"Friend {key} already selected, skipping click")
+      log.debug(f"Friend {key} already selected, skipping click")
       return True
 
-    self.scroll_to_top()
+    friend = self.friends_index[key]
+    region = self.config["friends_list_region"]
+    pixels_per_unit = self.config["scroll_pixels_per_unit"]
+    if self.list_position is None: self.scroll_to_top()
 
-    for _ in range(self.friends_index[key].scrolls):
-      self.mouse_to_list()
-      pyautogui.scroll(-SCROLL_LENGTH)
-      time.sleep(SCROLL_WAIT)
+    # Move relative to where the list already is
+    if pixels_per_unit and friend.offset is not None:
+      # Reach the row in a single scroll, aiming for the middle of the list viewport
+      target = max(0, friend.offset - region[3] // 2)
+      if self.list_max_offset is not None: target = min(target, self.list_max_offset)
+      target_position = round(target / pixels_per_unit)
+      if target_position != self.list_position:
+        self.check_cancelled()
+        self.mouse_to_list()
+        units, self.list_position = self.list_position - target_position, None # Unknown until the scroll is done
+        self.scroll_list(units)
+      scrolled = round(target_position * pixels_per_unit)
+      if self.list_max_offset is not None: scrolled = min(scrolled, self.list_max_offset)
+      click_y = region[1] + friend.offset - scrolled
+    else:
+      # Replay indexing steps, only whole steps keep the row where it was indexed
+      target_position = friend.scrolls * self.scroll_step
+      if (target_position - self.list_position) % self.scroll_step: self.scroll_to_top()
+      # Going back up from where the list was clamped at the bottom would not retrace the indexing steps
+      elif target_position < self.list_position and (self.list_full_steps is None or self.list_position > self.list_full_steps * self.scroll_step):
+        self.scroll_to_top()
+      steps = (target_position - self.list_position) // self.scroll_step
+      if steps: self.list_position = None # A cancel between steps leaves the list somewhere unknown
+      for _ in range(abs(steps)):
+        self.check_cancelled()
+        self.mouse_to_list()
+        self.scroll_list(-self.scroll_step if steps > 0 else self.scroll_step)
+      click_y = friend.y
+    self.list_position = target_position
 
     # Perform the click in the middle of the name area
-    click_x = self.config["friends_list_region"][0] + (self.config["friends_list_region"][2] // 2)
-    click_y = self.friends_index[key].y
-    pyautogui.click(click_x, click_y)
-    print(f"Clicked {name} (scrolls={self.friends_index[key].scrolls}, y={click_y})")
-    time.sleep(self.config["map_load_delay"])
+    click_x = region[0] + (region[2] // 2)
+    self.check_cancelled()
+    before = self.map_signature()
+    self.click(click_x, click_y)
+    log.debug(f"Clicked {name} (scrolls={friend.scrolls}, offset={friend.offset}, y={click_y})")
+    waited = self.wait_for_map_settle(before)
+    self.record_map_wait(key, waited)
+    log.debug(f"Map settled after {waited:.2f}s")
 
     # Update currently selected friend
     self.currently_selected_friend = key
     return True
 
+  @staticmethod
+  def list_order_key(friend:Friend) -> tuple:
+    """Sort key for a friend's position in the list, top to bottom"""
+    if friend.offset is not None: return (0, friend.offset, 0)
+    return (1, friend.scrolls, friend.y) # Measured offsets always come before the first unmeasured frame
+
+  def capture_friends(self, names:list[str]=None) -> dict[str, dict]:
+    """Select and screenshot friends (all when names is None) in one top to bottom sweep of the list.
+    Returns the screenshot, error and timings per friend"""
+    results = {}
+    friends:dict[str, Friend] = {}
+    for name in (names if names is not None else self.friends_index):
+      key = self.find_friend(name)
+      if not key: results[name] = {"screenshot": None, "error": "Friend not found"}
+      else: friends[key] = self.friends_index[key]
+
+    sweep_started_at = time.time()
+    for done, friend in enumerate(sorted(friends.values(), key=self.list_order_key), 1):
+      if self.yield_hook: self.yield_hook() # More urgent GUI work can run between friends
+      self.check_cancelled()
+      started_at = time.time()
+      selected_at = None
+      try:
+        if not self.click_friend(friend.name): raise Exception("Failed to select friend")
+        selected_at = time.time()
+        screenshot = self.screenshot_map()
+        results[friend.name] = {"screenshot": screenshot, "error": None}
+      except Exception as e:
+        results[friend.name] = {"screenshot": None, "error": str(e)}
+      done_at = time.time()
+      results[friend.name]["select_time"] = round((selected_at or done_at) - started_at, 3)
+      results[friend.name]["capture_time"] = round(done_at - selected_at, 3) if selected_at else None
+      STEP_SECONDS.observe(done_at - started_at, "capture_friend")
+      self.report_progress({"type": "captured", "name": friend.name, "done": done, "total": len(friends), **results[friend.name]})
+    self.index_store.flush()
+    log.info(f"Captured {len(friends)} friends in {time.time() - sweep_started_at:.1f}s")
+    return results
+
   def screenshot_map(self, custom_filename:str=None):
       """Take screenshot of map area, of currently selected friend"""
+      from imaging import image_hash
       if(not self.currently_selected_friend): friend_name = "NO_SELECTION"
       else: friend_name = self.currently_selected_friend
+      current_friend = self.get_selected_friend()
+
+      img = self.capture("map_region")
+      content_hash = image_hash(img)
+
+      # Map unchanged, keep the previous file and only refresh its time.
+      # Only identical captures count, a moved pin changes few pixels
+      if(current_friend and not custom_filename and self.config["screenshot_skip_unchanged"]
+         and content_hash == current_friend.last_screenshot_hash
+         and self.screenshot_exists(current_friend.last_screenshot)):
+        current_friend.last_screenshot_at = time.time()
+        self.publish_snapshot([current_friend.name])
+        self.save_friend(current_friend)
+        self.queue_pin_location(current_friend.name, img)
+        log.debug(f"Map unchanged, kept screenshot: {current_friend.last_screenshot}")
+        return current_friend.last_screenshot
       
+      ext = SCREENSHOT_FORMATS[self.config["screenshot_format"]][0]
       timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
       filename = self.config["filename_format"]
       if(custom_filename): filename = custom_filename
       filename = filename.format(name=friend_name, timestamp=timestamp)
-      if(filename[:-4].lower() != ".png"): filename += ".png" # Ensure .png extension
-      path = os.path.join(self.config["screenshot_dir"], filename)
-      pyautogui.screenshot(region=self.config["map_region"]).save(path)
-      print(f"Saved screenshot: {filename}")
+      filename = os.path.splitext(filename)[0] + ext # Extension follows the configured format
+      self.queue_screenshot(img, filename, current_friend.name if current_friend else None, content_hash)
 
-      current_friend = self.get_selected_friend()
       if(current_friend):
         current_friend.last_screenshot = filename
         current_friend.last_screenshot_at = time.time()
-        self.save_index()
+        current_friend.last_screenshot_hash = content_hash
+        self.publish_snapshot([current_friend.name])
+        self.save_friend(current_friend)
+        self.queue_pin_location(current_friend.name, img)
       return filename
 
+  def get_encoder_pool(self) -> ThreadPoolExecutor:
+    if not self.encoder_pool:
+      self.encoder_pool = ThreadPoolExecutor(max_workers=self.config["encoder_workers"], thread_name_prefix="encoder")
+    return self.encoder_pool
+
+  def get_pin_template(self) -> np.ndarray | None:
+    import cv2
+    path = self.config["pin_template"]
+    if path != self.pin_template_path:
+      template = cv2.imread(path, cv2.IMREAD_COLOR) if path else None
+      if path and template is None: log.warning(f"Could not read pin template '{path}'")
+      self.pin_template = cv2.cvtColor(template, cv2.COLOR_BGR2RGB) if template is not None else None
+      self.pin_template_path = path
+    return self.pin_template
+
+  def queue_pin_location(self, name:str, img:np.ndarray) -> Future | None:
+    """Find the friend's pin in a map capture on the encoder pool and add it to their location history"""
+    from imaging import locate_pin
+    template = self.get_pin_template()
+    hsv_range = self.config["pin_hsv_range"]
+    if template is None and not hsv_range: return None
+    captured_at = time.time()
+    min_score = self.config["pin_min_score"]
+    def locate():
+      with span("pin_locate"): pin = locate_pin(img, template, hsv_range, min_score)
+      if pin: self.location_store.append(name, captured_at, *pin)
+      return pin
+    def done(job:Future):
+      if job.exception(): log.error(f"Pin localization failed for {name}: {job.exception()}")
+    job = self.get_encoder_pool().submit(locate)
+    job.add_done_callback(done)
+    return job
+
+  def queue_screenshot(self, img:np.ndarray, filename:str, friend:str=None, content_hash:str=None) -> Future:
+    """Encode and store a capture on the encoder pool so the GUI can move on straight away"""
+    from imaging import image_hash
+    catalog = self.get_screenshot_catalog()
+    path = os.path.join(self.config["screenshot_dir"], filename)
+    ext = os.path.splitext(filename)[1]
+    quality = self.config["screenshot_quality"]
+
+    # Identical captures share one stored file, named screenshots are hard links to it
+    objects_dir = os.path.join(self.config["screenshot_dir"], OBJECTS_DIR)
+    object_path = os.path.join(objects_dir, (content_hash or image_hash(img)) + ext)
+    linked = self.hard_links_supported(objects_dir)
+    with self.encode_lock:
+      object_job = self.pending_objects.get(object_path) if linked else None
+      writes_object = linked and not object_job and not os.path.exists(object_path)
+
+      def store():
+        if not linked: # Copies can't share storage, write the screenshot itself
+          with span("encode"): data = encode_image(img, ext, quality)
+          with open(path + ".tmp", "wb") as f: f.write(data)
+          os.replace(path + ".tmp", path)
+        else:
+          if object_job: object_job.result() # Same image is already being encoded
+          if writes_object:
+            os.makedirs(objects_dir, exist_ok=True)
+            with span("encode"): data = encode_image(img, ext, quality)
+            with open(object_path + ".tmp", "wb") as f: f.write(data)
+            os.replace(object_path + ".tmp", object_path)
+          if os.path.exists(path): os.remove(path)
+          os.link(object_path, path)
+        catalog.add(filename, friend)
+        log.debug(f"Saved screenshot: {filename}")
+
+      job = self.get_encoder_pool().submit(store)
+      self.pending_screenshots[filename] = job
+      if writes_object: self.pending_objects[object_path] = job
+      if linked: self.object_users[object_path] = self.object_users.get(object_path, 0) + 1
+
+    def done(_):
+      with self.encode_lock:
+        if self.pending_screenshots.get(filename) is job: del self.pending_screenshots[filename]
+        if self.pending_objects.get(object_path) is job: del self.pending_objects[object_path]
+        if linked:
+          self.object_users[object_path] -= 1
+          if not self.object_users[object_path]: del self.object_users[object_path]
+      if job.exception(): log.error(f"Failed to save screenshot {filename}: {job.exception()}")
+    job.add_done_callback(done)
+    return job
+
+  def hard_links_supported(self, objects_dir:str) -> bool:
+    """Whether objects_dir can hold hard links, checked once per folder by linking a scratch file"""
+    if objects_dir not in self.hard_links:
+      os.makedirs(objects_dir, exist_ok=True)
+      probe = os.path.join(objects_dir, f"link-probe-{os.getpid()}.tmp")
+      try:
+        open(probe, "w").close()
+        os.link(probe, probe + ".tmp")
+        os.remove(probe + ".tmp")
+        self.hard_links[objects_dir] = True
+      except OSError:
+        log.warning(f"No hard links in {objects_dir}, screenshots are stored as separate files")
+        self.hard_links[objects_dir] = False
+      finally:
+        if os.path.exists(probe): os.remove(probe)
+    return self.hard_links[objects_dir]
+
+  def get_screenshot_catalog(self) -> ScreenshotCatalog:
+    """Catalog of screenshot_dir, loaded and caught up with the folder on first use"""
+    catalog = self.screenshot_catalog
+    if not catalog or catalog.directory != self.config["screenshot_dir"] or catalog.pattern != ScreenshotCatalog.filename_pattern(self.config["filename_format"]):
+      catalog = ScreenshotCatalog(self.config["screenshot_dir"], self.config["filename_format"], CATALOG_FILE, self.read_only)
+      catalog.load()
+      catalog.refresh()
+      self.screenshot_catalog = catalog
+    return catalog
+
+  def wait_for_screenshot(self, filename:str, timeout:float=10) -> bool:
+    """Wait for a screenshot still being encoded, returns False if it failed"""
+    job = self.pending_screenshots.get(filename)
+    if not job: return True
+    try: job.result(timeout)
+    except Exception: return False
+    return True
+
+  def screenshot_exists(self, filename:str) -> bool:
+    return filename in self.pending_screenshots or os.path.exists(os.path.join(self.config["screenshot_dir"], filename))
+
+  @staticmethod
+  def is_screenshot_name(filename:str) -> bool:
+    """A plain file name inside screenshot_dir, not a path or a hidden store like .thumbs"""
+    return bool(filename) and os.path.basename(filename) == filename and not filename.startswith(".")
+
+  def thumbnail_path(self, filename:str, size:int) -> str | None:
+    """Path of a cached thumbnail no larger than size pixels, made or refreshed as needed.
+    Read-only instances only use existing thumbnails, None when there is none"""
+    if not self.is_screenshot_name(filename): raise ValueError(f"Invalid screenshot name '{filename}'")
+    size = next((s for s in THUMBNAIL_SIZES if s >= size), THUMBNAIL_SIZES[-1])
+    source = os.path.join(self.config["screenshot_dir"], filename)
+    thumb_dir = os.path.join(self.config["screenshot_dir"], THUMBS_DIR, str(size))
+    thumb = os.path.join(thumb_dir, filename + ".jpg")
+    if os.path.exists(thumb) and os.path.getmtime(thumb) >= os.path.getmtime(source): return thumb
+    if self.read_only: return None
+
+    import cv2
+    img = cv2.imread(source, cv2.IMREAD_COLOR)
+    if img is None: raise ValueError(f"Could not read screenshot '{filename}'")
+    scale = size / max(img.shape[:2])
+    if scale < 1: img = cv2.resize(img, (round(img.shape[1] * scale), round(img.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    os.makedirs(thumb_dir, exist_ok=True)
+    ok, data = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    if not ok: raise ValueError(f"Could not encode thumbnail of '{filename}'")
+    with open(thumb + ".tmp", "wb") as f: f.write(data.tobytes())
+    os.replace(thumb + ".tmp", thumb)
+    return thumb
+
+  def prune_screenshot_objects(self) -> int:
+    """Remove stored screenshot files no named screenshot links to anymore, and thumbnails of deleted screenshots"""
+    screenshot_dir = self.config["screenshot_dir"]
+    removed = 0
+    objects_dir = os.path.join(screenshot_dir, OBJECTS_DIR)
+    # Link counts only tell whether an object is used where hard links work
+    if os.path.isdir(objects_dir) and self.hard_links_supported(objects_dir):
+      for entry in os.scandir(objects_dir):
+        if entry.name.endswith(".tmp") or not entry.is_file(): continue
+        with self.encode_lock: # A queued screenshot can't start using the object while it is checked
+          if entry.path in self.object_users or os.stat(entry.path).st_nlink > 1: continue
+          os.remove(entry.path)
+        removed += 1
+    for size in THUMBNAIL_SIZES:
+      thumb_dir = os.path.join(screenshot_dir, THUMBS_DIR, str(size))
+      if not os.path.isdir(thumb_dir): continue
+      for entry in os.scandir(thumb_dir):
+        if not os.path.exists(os.path.join(screenshot_dir, entry.name[:-len(".jpg")])): os.remove(entry.path)
+    return removed
+
   def save_index(self):
-    cache_data = {
-      "friends_index": { name: friend.to_dict() for name, friend in self.friends_index.items() },
-      "last_sync": self.last_sync
+    """Write the whole index, built from the published snapshot so it can run off the GUI thread"""
+    self.index_store.save(self.index_data) # Read under the store's lock, updates are published before they are buffered
+
+  def index_data(self) -> dict:
+    snapshot = self.snapshot
+    return {
+      "friends_index": { friend["name"]: { key: value for key, value in friend.items() if key != "version" } for friend in snapshot.friends },
+      "last_sync": self.last_sync,
+      "scroll_step": self.scroll_step,
+      "list_max_offset": self.list_max_offset,
+      "list_full_steps": self.list_full_steps,
+      "version": snapshot.version
     }
-    with open(CACHE_FILE, "w") as f: json.dump(cache_data, f, indent=2)
+
+  def save_friend(self, friend:Friend):
+    """Journal one friend's changes instead of rewriting the whole index"""
+    self.index_store.update(friend.name, friend.to_dict(), self.snapshot.version)
 
   def load_or_build_index(self):
     res = self.load_index()
     if not res:
-      print("Could not load index, building new one...")
+      log.info("Could not load index, building new one...")
       self.build_index()
       return
     if not self.last_sync:
-      print("No last sync timestamp, rebuilding index...")
+      log.info("No last sync timestamp, rebuilding index...")
       self.build_index()
       return
     # Parse ISO format timestamp
     last_sync_time = datetime.fromisoformat(self.last_sync).timestamp()
     current_time = time.time()
     if (current_time - last_sync_time) > self.config["index_stale_time"]:
-      print("Index is stale, rebuilding...")
+      log.info("Index is stale, rebuilding...")
       self.build_index()
       return
-    print("Index is fresh, no need to automaticly rebuild.")
+    log.info("Index is fresh, no need to automaticly rebuild.")
   
+  def save_config(self):
+    with open(CONFIG_FILE, "w") as f: json.dump(self.config, f, indent=4)
+
   def load_config(self):
     if os.path.exists(CONFIG_FILE):
       with open(CONFIG_FILE, "r") as f:
-        self.config = json.load(f)
+        self.config = {**DEFAULT_CONFIG, **json.load(f)} # Defaults cover keys added after setup
     else:
-      print("No config file found, using default configuration.")
-      print("Setup the bot to create a config file.")
+      log.warning("No config file found, using default configuration. Setup the bot to create a config file.")
+
+  def set_refresh_interval(self, name:str, interval:float|None) -> bool:
+    """Set how often the scheduler captures a friend, None goes back to the config default"""
+    key = self.find_friend(name)
+    if not key: return False
+    friend = self.friends_index[key]
+    friend.refresh_interval = interval
+    self.publish_snapshot([key])
+    self.save_friend(friend)
+    return True
 
   def find_friend(self, name):
-    """Find friend by partial name match"""
-    if not name: return None   
-    name_lower = name.lower()
-    # First try exact match
-    if name_lower in self.friends_index: return name_lower
-        
-    # Then try partial match
-    for indexed_name in self.friends_index:
-      if name_lower in indexed_name.lower() or indexed_name.lower() in name_lower:
-        return indexed_name
-    return None
+    """Find friend by exact, partial or close (OCR error) name match"""
+    return self.name_index.lookup(name)
   
   def get_all_friends(self) -> list[Friend]:
     """Get list of all indexed friends"""
@@ -282,7 +990,7 @@ class FindMy:
   def clear_selection(self):
     """Clear currently selected friend tracking"""
     self.currently_selected_friend = None
-    print("Cleared friend selection tracking")
+    log.debug("Cleared friend selection tracking")
 
   def get_selected_friend(self) -> Friend | None:
     """Get currently selected friend"""
@@ -302,8 +1010,10 @@ class FindMy:
       return ''.join(filter(str.isalnum, text)).lower()
 
   @staticmethod # Make text extraction easy
-  def filter_text_color(pil_img):
-    gray = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2GRAY)
+  def filter_text_color(img:np.ndarray):
+    import cv2
+    import numpy as np
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
     _, thresh = cv2.threshold(gray, 65, 255, cv2.THRESH_BINARY_INV)
     kernel = np.ones((2,2), np.uint8)
     thresh = cv2.dilate(thresh, kernel, iterations=1)
@@ -321,7 +1031,10 @@ class FindMy:
 # ======================================
 # SETUP SCRIPT
 if __name__ == "__main__":
-  ask = input("1. Setup FindMy Config\n2.Test Indexing\n3. Test Friend Selection\nChoose an option (1, 2 or 3): ")
+  import cv2
+  from backends import create_backend
+  configure_logging()
+  ask = input("1. Setup FindMy Config\n2.Test Indexing\n3. Test Friend Selection\n4. Calibrate Scrolling\nChoose an option (1, 2, 3 or 4): ")
   if ask.lower() == "2":
     bot = FindMy()
     print("Building index for testing... starting in 3 seconds, switch to Find My app window.")
@@ -346,6 +1059,13 @@ if __name__ == "__main__":
     file = bot.screenshot_map()
     print(f"Screenshot saved to {file}")
     exit(0)
+  elif ask.lower() == "4":
+    bot = FindMy()
+    print("Calibrating scroll distance... starting in 3 seconds, switch to Find My app window.")
+    time.sleep(3)
+    if not bot.calibrate_scroll(): exit(1)
+    print("Rebuild the index so friends get list offsets for the calibrated scrolling.")
+    exit(0)
   
   if(ask.lower() != "1"): exit(1)
 
@@ -355,7 +1075,7 @@ if __name__ == "__main__":
   try: hours_stale = int(hours_stale)
   except: hours_stale = 4
 
-  map_delay = input("Enter how many seconds to wait for the map to load (default 4.0): ")
+  map_delay = input("Enter the most seconds to wait for the map to load (default 4.0): ")
   try: map_delay = float(map_delay)
   except: map_delay = 4.0
 
@@ -379,6 +1099,7 @@ if __name__ == "__main__":
   print("Click the top-left corner of the friends list region.")
 
   import pynput.mouse as mouse
+  screen = create_backend()
   click_detected = False
   def on_click(x, y, button, pressed):
     global click_detected
@@ -392,7 +1113,7 @@ if __name__ == "__main__":
     listener = mouse.Listener(on_click=on_click)
     listener.start()
     while not click_detected: time.sleep(0.01)
-    return pyautogui.position()
+    return screen.position()
   
   tl_x, tl_y = get_next_click_position()
   print(f"Top-left corner recorded at ({tl_x}, {tl_y}), waiting for bottom-right corner...")
@@ -411,11 +1132,11 @@ if __name__ == "__main__":
 
   # Save previews of regions
   print("Capturing preview screenshots of the selected regions...")
-  list_img = pyautogui.screenshot(region=list_region)
-  map_img = pyautogui.screenshot(region=map_region)
+  list_img = screen.capture(list_region)
+  map_img = screen.capture(map_region)
   os.makedirs("setup_previews", exist_ok=True)
-  list_img.save(os.path.join("setup_previews", "friends_list_region.png"))
-  map_img.save(os.path.join("setup_previews", "map_region.png"))
+  cv2.imwrite(os.path.join("setup_previews", "friends_list_region.png"), cv2.cvtColor(list_img, cv2.COLOR_RGB2BGR))
+  cv2.imwrite(os.path.join("setup_previews", "map_region.png"), cv2.cvtColor(map_img, cv2.COLOR_RGB2BGR))
   print("Previews saved to 'setup_previews' folder. Please verify they are correct.\n")
 
   print("Now we need to know the location of the 'People' button in the Find My app.")
@@ -425,13 +1146,13 @@ if __name__ == "__main__":
   time.sleep(3)
   print("Waiting for click on 'People' button...")
   people_btn_pos = get_next_click_position()
-  print(f"'People' button position recorded at ({people_btn_pos.x}, {people_btn_pos.y}).\n")
+  print(f"'People' button position recorded at ({people_btn_pos[0]}, {people_btn_pos[1]}).\n")
 
   # Save config
   config = {
     "friends_list_region": list_region,
     "map_region": map_region,
-    "people_button": (people_btn_pos.x, people_btn_pos.y),
+    "people_button": people_btn_pos,
     "index_stale_time": hours_stale * 3600,
     "ocr_language": "eng",
     "access_token": access_token,
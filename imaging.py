@@ -0,0 +1,81 @@
+import hashlib
+import cv2
+import numpy as np
+
+def segment_rows(binary:np.ndarray, min_height:int=6, merge_gap:int=3, min_ink:int=2) -> list[tuple[int, int]]:
+  """Find text rows in a binarized list frame from its horizontal projection profile.
+  Returns (top, bottom) pairs, rows cut off by the frame edge are left out"""
+  ink = np.count_nonzero(binary, axis=1) >= min_ink
+  edges = np.flatnonzero(np.diff(np.concatenate(([False], ink, [False])).astype(np.int8)))
+  starts, ends = edges[0::2], edges[1::2]
+  if len(starts) == 0: return []
+
+  # Merge runs split by small gaps (i dots, descenders)
+  keep = np.concatenate(([True], (starts[1:] - ends[:-1]) > merge_gap))
+  group_starts = np.flatnonzero(keep)
+  group_ends = np.append(group_starts[1:] - 1, len(ends) - 1)
+  starts, ends = starts[group_starts], ends[group_ends]
+
+  valid = ((ends - starts) >= min_height) & (starts > 0) & (ends < binary.shape[0])
+  return [(int(top), int(bottom)) for top, bottom in zip(starts[valid], ends[valid])]
+
+def crop_row(binary:np.ndarray, top:int, bottom:int, pad:int=4) -> np.ndarray:
+  """Crop a row to its ink, with a small blank border for tesseract"""
+  band = binary[top:bottom]
+  cols = np.flatnonzero(np.count_nonzero(band, axis=0))
+  if len(cols): band = band[:, cols[0]:cols[-1] + 1]
+  return cv2.copyMakeBorder(band, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=0)
+
+def image_hash(img:np.ndarray) -> str:
+  """Exact content hash of an image's pixels"""
+  h = hashlib.blake2b(digest_size=16)
+  h.update(str(img.shape).encode())
+  h.update(np.ascontiguousarray(img).data)
+  return h.hexdigest()
+
+def frame_signature(img:np.ndarray, width:int=64) -> np.ndarray:
+  """Small grayscale copy of a frame for cheap change detection"""
+  if img.ndim == 3: img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+  height = max(1, round(img.shape[0] * width / img.shape[1]))
+  return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def signature_diff(a:np.ndarray, b:np.ndarray) -> float:
+  """Mean absolute difference (0-255) between two frame signatures"""
+  if a.shape != b.shape: return 255.0
+  return float(cv2.absdiff(a, b).mean())
+
+def estimate_shift(prev:np.ndarray, cur:np.ndarray, band:float=0.15, max_score:float=0.1) -> int | None:
+  """Pixels the content of prev moved up to give cur, by matching the top band of cur inside prev.
+  None when the band has no content to match or the best match is poor"""
+  band_height = max(8, int(cur.shape[0] * band))
+  template = cur[:band_height]
+  if not np.count_nonzero(template) or prev.shape[0] < band_height: return None
+  scores = cv2.matchTemplate(prev, template, cv2.TM_SQDIFF_NORMED)[:, 0]
+  shift = int(np.argmin(scores))
+  if scores[shift] > max_score: return None
+  return shift
+
+def locate_pin(img:np.ndarray, template:np.ndarray=None, hsv_range:tuple=None, min_score:float=0.5, min_area:int=20) -> tuple[int, int, float] | None:
+  """Pixel position and confidence (0-1) of the pin in a map capture.
+  Matches template when given, otherwise the colour range (HSV lower, upper) picking the largest blob near the middle"""
+  if template is not None:
+    scores = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (x, y) = cv2.minMaxLoc(scores)
+    if score < min_score: return None
+    return x + template.shape[1] // 2, y + template.shape[0] // 2, float(score)
+
+  if hsv_range is None: return None
+  mask = cv2.inRange(cv2.cvtColor(img, cv2.COLOR_RGB2HSV), np.array(hsv_range[0], np.uint8), np.array(hsv_range[1], np.uint8))
+  count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+  areas = stats[1:, cv2.CC_STAT_AREA]
+  if not np.any(areas >= min_area): return None
+  # The map centres on the selected friend, so blobs near the middle are more likely their pin
+  center = np.array(img.shape[1::-1], np.float64) / 2
+  distance = np.linalg.norm(centroids[1:] - center, axis=1) / np.linalg.norm(center)
+  best = int(np.argmax(np.where(areas >= min_area, areas * (1 - 0.5 * distance), -1)))
+  width, height = stats[best + 1, cv2.CC_STAT_WIDTH], stats[best + 1, cv2.CC_STAT_HEIGHT]
+  # A filled round pin covers pi/4 of its bounding box, and the box is square
+  roundness = min(1.0, areas[best] / (width * height) / (np.pi / 4)) * min(width, height) / max(width, height)
+  if roundness < min_score: return None
+  x, y = centroids[best + 1]
+  return int(round(x)), int(round(y)), float(roundness)
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+from typing import Callable
+from metrics import span, STEP_SECONDS
+
+class IndexStore:
+  """friends_index.json plus an append-only journal of friend updates.
+  Updates are buffered and appended in batches, the journal is folded back into the
+  JSON file (compacted) once it gets long. Full saves are written to a temp file and
+  swapped in, so a crash never leaves a half written index"""
+  def __init__(self, path:str, flush_interval:float=2.0, compact_after:int=500):
+    self.path = path
+    self.journal_path = path + ".journal"
+    self.flush_interval = flush_interval
+    self.compact_after = compact_after
+    self.compact = None # Callback doing a full save, set by the owner
+    self.generation = 0 # Bumped on every full save, journal entries from older generations are ignored
+    self.journal_lines = 0
+    self.needs_compaction = False
+    self.buffer:dict[str, dict] = {} # name -> latest record, repeated updates of a friend collapse into one
+    self.buffer_version = 0
+    self.lock = threading.RLock()
+    self.timer:threading.Timer = None
+    self.loaded_state:tuple = None # file_state() when last loaded
+
+  def file_state(self) -> tuple:
+    """(mtime, size) of the index file and the journal, None for a missing one"""
+    state = []
+    for path in (self.path, self.journal_path):
+      try:
+        stat = os.stat(path)
+        state.append((stat.st_mtime_ns, stat.st_size))
+      except FileNotFoundError: state.append(None)
+    return tuple(state)
+
+  def changed(self) -> bool:
+    """Whether another process has written the index or journal since it was loaded"""
+    return self.file_state() != self.loaded_state
+
+  def load(self) -> dict | None:
+    """Read the index and replay the journal on top of it"""
+    self.loaded_state = self.file_state() # Taken first, so a write during the read shows up as a change
+    if not os.path.exists(self.path): return None
+    with open(self.path, "r") as f: data = json.load(f)
+    if not data or "friends_index" not in data: return data
+    self.generation = data.get("generation", 0)
+    self.journal_lines = 0
+    if os.path.exists(self.journal_path):
+      with open(self.journal_path, "r") as f:
+        for line in f:
+          try: entry = json.loads(line)
+          except ValueError:
+            self.needs_compaction = True # Torn write from a crash, rewrite without it
+            continue
+          if entry.get("generation") != self.generation: continue # Written before the last full save
+          self.journal_lines += 1
+          if entry["name"] in data["friends_index"]: data["friends_index"][entry["name"]] = entry["friend"]
+          data["version"] = max(data.get("version", 0), entry.get("version", 0))
+    if self.journal_lines >= self.compact_after: self.needs_compaction = True
+    return data
+
+  def save(self, data:dict | Callable[[], dict]):
+    """Write the whole index and start a new, empty journal.
+    data can be a function building it, called under the lock so an update buffered meanwhile isn't dropped"""
+    with self.lock, span("index_save"):
+      if callable(data): data = data()
+      self._cancel_timer()
+      self.buffer.clear()
+      self.generation += 1
+      tmp_path = self.path + ".tmp"
+      with open(tmp_path, "w") as f:
+        json.dump({**data, "generation": self.generation}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+      os.replace(tmp_path, self.path)
+      open(self.journal_path, "w").close()
+      self.journal_lines = 0
+      self.needs_compaction = False
+
+  def update(self, name:str, record:dict, version:int):
+    """Queue a friend update, written with the next flush"""
+    with self.lock:
+      self.buffer[name] = record
+      self.buffer_version = version
+      if not self.timer:
+        self.timer = threading.Timer(self.flush_interval, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+  def flush(self):
+    """Append buffered updates to the journal, compacting if it has grown too long"""
+    with self.lock:
+      self._cancel_timer()
+      if self.buffer:
+        started_at = time.perf_counter()
+        lines = [json.dumps({"generation": self.generation, "version": self.buffer_version, "name": name, "friend": record})
+                 for name, record in self.buffer.items()]
+        with open(self.journal_path, "a") as f:
+          f.write("\n".join(lines) + "\n")
+          f.flush()
+          os.fsync(f.fileno())
+        self.journal_lines += len(lines)
+        self.buffer.clear()
+        STEP_SECONDS.observe(time.perf_counter() - started_at, "index_flush") # Only flushes that write
+      due = self.journal_lines >= self.compact_after
+    if due and self.compact: self.compact()
+
+  def _cancel_timer(self):
+    if self.timer and self.timer is not threading.current_thread(): self.timer.cancel()
+    self.timer = None
@@ -15,6 +15,11 @@ pip install opencv-python
 pip install numpy
 pip install pynput
 
+# Optional: keeps tesseract loaded in-process for faster OCR (needs the tesseract headers to build)
+pip install tesserocr || echo "tesserocr not installed, OCR will fall back to pytesseract"
+# Optional: captures the screen straight into NumPy arrays, faster than pyautogui screenshots
+pip install mss || echo "mss not installed, screen capture will fall back to pyautogui"
+
 echo ""
 echo "Python packages installed successfully!"
 
@@ -0,0 +1,40 @@
+import os
+import bisect
+import struct
+import threading
+
+# One sample: capture time (unix seconds), pin x and y in map_region pixels, confidence 0-255
+SAMPLE_FORMAT = "<IhhB"
+SAMPLE_SIZE = struct.calcsize(SAMPLE_FORMAT)
+SAMPLE_TIME = struct.Struct("<I") # Leading field of a sample, for searching by time
+
+class LocationStore:
+  """Per-friend pin position history, one file of fixed size binary samples per friend"""
+  def __init__(self, directory:str):
+    self.directory = directory
+    self.lock = threading.Lock()
+
+  def path(self, name:str) -> str:
+    return os.path.join(self.directory, name + ".loc") # Index names are already cleaned to letters, numbers and spaces
+
+  def append(self, name:str, timestamp:float, x:int, y:int, confidence:float):
+    sample = struct.pack(SAMPLE_FORMAT, int(timestamp), x, y, round(min(max(confidence, 0.0), 1.0) * 255))
+    with self.lock:
+      os.makedirs(self.directory, exist_ok=True)
+      with open(self.path(name), "ab") as f: f.write(sample)
+
+  def raw(self, name:str, since:float=None, limit:int=None) -> bytes:
+    """Packed samples taken at or after since, the newest limit of them"""
+    path = self.path(name)
+    if not os.path.exists(path): return b""
+    with open(path, "rb") as f: data = f.read()
+    count = len(data) // SAMPLE_SIZE # A torn final sample is left out
+    start = 0
+    if since is not None: # Samples are appended in time order
+      start = bisect.bisect_left(range(count), since, key=lambda i: SAMPLE_TIME.unpack_from(data, i * SAMPLE_SIZE)[0])
+    if limit is not None: start = max(start, count - limit) if limit > 0 else count
+    return data[start * SAMPLE_SIZE:count * SAMPLE_SIZE]
+
+  def history(self, name:str, since:float=None, limit:int=None) -> list[tuple[int, int, int, float]]:
+    """(time, x, y, confidence 0-1) samples, oldest first"""
+    return [(t, x, y, round(confidence / 255, 3)) for t, x, y, confidence in struct.iter_unpack(SAMPLE_FORMAT, self.raw(name, since, limit))]
@@ -0,0 +1,119 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds, from a single capture up to a full index rebuild
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def format_labels(names:tuple[str, ...], values:tuple) -> str:
+  if not names: return ""
+  escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for value in values)
+  return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+def format_value(value:float) -> str:
+  if value == float("inf"): return "+Inf"
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+  kind = "untyped"
+  def __init__(self, name:str, help:str, labels:tuple[str, ...]=()):
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+    self.series:dict[tuple, object] = {} # label values -> value
+    self.lock = threading.Lock()
+
+  def samples(self) -> list[tuple[str, tuple, tuple, float]]:
+    """(suffix, label names, label values, value) per exported sample"""
+    with self.lock: series = dict(self.series)
+    return [("", self.labels, values, value) for values, value in sorted(series.items())]
+
+  def render(self) -> list[str]:
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+    for suffix, names, values, value in self.samples():
+      lines.append(f"{self.name}{suffix}{format_labels(names, values)} {format_value(value)}")
+    return lines
+
+class Counter(Metric):
+  kind = "counter"
+  def inc(self, *label_values, amount:float=1):
+    with self.lock: self.series[label_values] = self.series.get(label_values, 0) + amount
+
+class Gauge(Metric):
+  """Set directly, or read from function when rendered. function returns a value, or label values -> value"""
+  kind = "gauge"
+  def __init__(self, name:str, help:str, labels:tuple[str, ...]=(), function=None):
+    super().__init__(name, help, labels)
+    self.function = function
+
+  def set(self, value:float, *label_values):
+    with self.lock: self.series[label_values] = value
+
+  def samples(self):
+    if self.function:
+      try: value = self.function()
+      except Exception: return [] # A broken gauge shouldn't take the rest of the metrics down
+      series = value if isinstance(value, dict) else {(): value}
+      return [("", self.labels, values, value) for values, value in sorted(series.items())]
+    return super().samples()
+
+class Histogram(Metric):
+  """Observations counted per bucket upper bound, with their sum, per combination of label values"""
+  kind = "histogram"
+  def __init__(self, name:str, help:str, labels:tuple[str, ...]=(), buckets:tuple[float, ...]=DEFAULT_BUCKETS):
+    super().__init__(name, help, labels)
+    self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+  def observe(self, value:float, *label_values):
+    i = bisect.bisect_left(self.buckets, value)
+    with self.lock:
+      series = self.series.get(label_values)
+      if series is None: series = self.series[label_values] = [0] * len(self.buckets) + [0.0] # Bucket counts, then the sum
+      series[i] += 1
+      series[-1] += value
+
+  def samples(self):
+    with self.lock: series = { values: list(counts) for values, counts in self.series.items() }
+    samples = []
+    for values, counts in sorted(series.items()):
+      cumulative = 0
+      for bound, count in zip(self.buckets, counts):
+        cumulative += count
+        samples.append(("_bucket", self.labels + ("le",), values + (format_value(bound),), cumulative))
+      samples.append(("_sum", self.labels, values, counts[-1]))
+      samples.append(("_count", self.labels, values, cumulative))
+    return samples
+
+class Registry:
+  def __init__(self):
+    self.metrics:dict[str, Metric] = {}
+    self.lock = threading.Lock()
+
+  def register(self, metric:Metric) -> Metric:
+    """Add a metric, returns the one already registered under its name instead"""
+    with self.lock: return self.metrics.setdefault(metric.name, metric)
+
+  def counter(self, name:str, help:str, labels:tuple[str, ...]=()) -> Counter: return self.register(Counter(name, help, labels))
+  def gauge(self, name:str, help:str, labels:tuple[str, ...]=(), function=None) -> Gauge: return self.register(Gauge(name, help, labels, function))
+  def histogram(self, name:str, help:str, labels:tuple[str, ...]=(), buckets:tuple[float, ...]=DEFAULT_BUCKETS) -> Histogram:
+    return self.register(Histogram(name, help, labels, buckets))
+
+  def render(self) -> str:
+    """Every metric in the Prometheus text exposition format"""
+    with self.lock: metrics = list(self.metrics.values())
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+REGISTRY = Registry()
+STEP_SECONDS = REGISTRY.histogram("findmy_step_seconds", "Time spent in each capture, OCR, scroll, click, map settle, encode and persist step", ("step",))
+
+@contextmanager
+def span(step:str):
+  """Time the block into findmy_step_seconds, also when it raises"""
+  started_at = time.perf_counter()
+  try: yield
+  finally: STEP_SECONDS.observe(time.perf_counter() - started_at, step)
+
+def configure_logging(level:str="INFO"):
+  logging.basicConfig(level=getattr(logging, str(level).upper(), logging.INFO), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -0,0 +1,117 @@
+import re
+from typing import Iterable
+
+def normalize_name(name:str) -> str:
+  """Lowercase letters, numbers and single spaces, the form index names are stored in"""
+  return " ".join(re.sub(r"[^a-z0-9\s]", "", name.lower()).split())
+
+def trigrams(name:str) -> set[str]:
+  padded = f"  {name} "
+  return { padded[i:i + 3] for i in range(len(padded) - 2) }
+
+def edit_distance(a:str, b:str, limit:int=None) -> int:
+  """Levenshtein distance counting a swap of neighbouring letters as one edit (common OCR error).
+  Stops early once it must exceed limit, returning limit + 1"""
+  if a == b: return 0
+  if limit is not None and abs(len(a) - len(b)) > limit: return limit + 1
+  previous2, previous = None, list(range(len(b) + 1))
+  for i in range(1, len(a) + 1):
+    current = [i] + [0] * len(b)
+    for j in range(1, len(b) + 1):
+      cost = a[i - 1] != b[j - 1]
+      current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+      if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+        current[j] = min(current[j], previous2[j - 2] + 1)
+    if limit is not None and min(current) > limit: return limit + 1
+    previous2, previous = previous, current
+  return previous[-1]
+
+def tokens_kept(a:str, b:str) -> bool:
+  """Whether every word that differs between a and b keeps most of its letters.
+  An edit replacing a whole short word, an initial or a two letter name, makes a different person"""
+  words_a, words_b = a.split(), b.split()
+  if len(words_a) != len(words_b): return True # A space read or missed, the letters are the same
+  return all(word_a == word_b or min(len(word_a), len(word_b)) >= 3 for word_a, word_b in zip(words_a, words_b))
+
+class NameIndex:
+  """Name lookup tolerant of partial queries and OCR errors.
+  Exact names win, then names containing the query, then the closest by edit distance, then names the query contains.
+  Trigram postings keep the candidates to a handful of names"""
+  def __init__(self, names:Iterable[str], max_edits:int=1):
+    self.names = sorted(names) # Sorted so ties always resolve the same way
+    self.max_edits = max_edits # Edits allowed between a query and a name, a few letters differ between people too
+    self.exact = { normalize_name(name): name for name in self.names }
+    self.postings:dict[str, list[int]] = {}
+    for i, name in enumerate(self.names):
+      for gram in trigrams(normalize_name(name)): self.postings.setdefault(gram, []).append(i)
+
+  def candidates(self, query:str) -> dict[int, int]:
+    """Names sharing trigrams with the query -> number shared"""
+    shared:dict[int, int] = {}
+    for gram in trigrams(query):
+      for i in self.postings.get(gram, ()): shared[i] = shared.get(i, 0) + 1
+    return shared
+
+  def closest(self, name:str, exclude:set[str]=()) -> tuple[str, int] | None:
+    """Nearest name within max_edits and that distance, None when two names are equally close"""
+    query = normalize_name(name)
+    if not query: return None
+    shared = self.candidates(query)
+    best, tied = None, False
+    for i in sorted(shared, key=lambda i: (-shared[i], i)):
+      candidate = self.names[i]
+      if candidate in exclude: continue
+      normalized = normalize_name(candidate)
+      limit = best[1] if best else self.max_edits
+      distance = edit_distance(query, normalized, limit)
+      if distance > limit or not tokens_kept(query, normalized): continue
+      if best and distance == best[1]: tied = True
+      else: best, tied = (candidate, distance), False
+      if distance == 0: break
+    return None if tied else best
+
+  def lookup(self, name:str) -> str | None:
+    """Indexed name matching a user or OCR supplied name, None when nothing is close"""
+    if not name: return None
+    query = normalize_name(name)
+    if not query: return None
+    if query in self.exact: return self.exact[query]
+
+    # Part of a name, the closest in length is the most specific match
+    pool = list(self.candidates(query)) if len(query) >= 3 else range(len(self.names))
+    partial = [i for i in pool if query in normalize_name(self.names[i])]
+    if partial: return self.names[min(partial, key=lambda i: (len(normalize_name(self.names[i])), i))]
+
+    match = self.closest(query)
+    if match: return match[0]
+
+    # A name with extra text around it, the longest such name is the most specific
+    contained = [i for i in pool if normalize_name(self.names[i]) in query]
+    if contained: return self.names[min(contained, key=lambda i: (-len(normalize_name(self.names[i])), i))]
+    return None
+
+  def __len__(self): return len(self.names)
+
+def match_names(old:Iterable[str], new:Iterable[str], max_edits:int=1) -> dict[str, str]:
+  """Pair names from a previous index build with this build's, exact first, then closest first.
+  Uses the same limits as lookups, and skips an old name that several new names are equally close to.
+  Returns new name -> old name, each old name used at most once"""
+  old_index = NameIndex(old, max_edits)
+  pairs:dict[str, str] = {}
+  old_names = set(old_index.names)
+  unmatched = []
+  for name in new:
+    if name in old_names: pairs[name] = name
+    else: unmatched.append(name)
+  used = set(pairs.values())
+  fuzzy = []
+  for name in unmatched:
+    match = old_index.closest(name, used)
+    if match: fuzzy.append((match[1], name, match[0]))
+  claims:dict[tuple[str, int], int] = {}
+  for distance, _, old_name in fuzzy: claims[old_name, distance] = claims.get((old_name, distance), 0) + 1
+  for distance, name, old_name in sorted(fuzzy):
+    if old_name in used or claims[old_name, distance] > 1: continue
+    pairs[name] = old_name
+    used.add(old_name)
+  return pairs
@@ -0,0 +1,114 @@
+import os
+import json
+import shlex
+import logging
+from collections import OrderedDict
+import numpy as np
+import pytesseract
+from metrics import span
+
+# tesserocr keeps a tesseract instance loaded in-process and takes raw pixel buffers,
+# pytesseract is the fallback and starts a tesseract process per call
+try:
+  import tesserocr
+except ImportError:
+  tesserocr = None
+
+log = logging.getLogger(__name__)
+
+class OCREngine:
+  """Warm tesseract instance, takes NumPy images directly"""
+  def __init__(self, language:str="eng", psm:int|None=None, whitelist:str|None=None):
+    self.language = language
+    self.psm = psm
+    self.whitelist = whitelist
+    self.api = None
+    if tesserocr:
+      self.api = tesserocr.PyTessBaseAPI(lang=language)
+      if psm is not None: self.api.SetPageSegMode(psm)
+      if whitelist: self.api.SetVariable("tessedit_char_whitelist", whitelist)
+
+  @property
+  def settings(self) -> tuple: return (self.language, self.psm, self.whitelist)
+
+  def _set_image(self, img:np.ndarray):
+    img = np.ascontiguousarray(img)
+    height, width = img.shape[:2]
+    bpp = 1 if img.ndim == 2 else img.shape[2]
+    self.api.SetImageBytes(img.tobytes(), width, height, bpp, width * bpp)
+
+  def _pytesseract_config(self) -> str:
+    config = []
+    if self.psm is not None: config.append(f"--psm {self.psm}")
+    # pytesseract splits the config like a shell, quoting keeps spaces and apostrophes in the whitelist
+    if self.whitelist: config.append("-c " + shlex.quote(f"tessedit_char_whitelist={self.whitelist}"))
+    return " ".join(config)
+
+  def image_to_string(self, img:np.ndarray) -> str:
+    if not self.api:
+      return pytesseract.image_to_string(img, lang=self.language, config=self._pytesseract_config())
+    self._set_image(img)
+    return self.api.GetUTF8Text()
+
+  def close(self):
+    if self.api:
+      self.api.End()
+      self.api = None
+
+# One engine per process, so pool workers each keep their own instance warm
+_engine:OCREngine = None
+
+def configure_ocr_engine(language:str="eng", psm:int|None=None, whitelist:str|None=None):
+  """Set up this process's engine, also used as the process pool initializer"""
+  global _engine
+  if _engine and _engine.settings == (language, psm, whitelist): return
+  if _engine: _engine.close()
+  _engine = OCREngine(language, psm, whitelist)
+
+def get_ocr_engine() -> OCREngine:
+  if not _engine: configure_ocr_engine()
+  return _engine
+
+class OCRCache:
+  """Bounded LRU of row pixel hash -> OCR text, persisted as JSON.
+  Entries are only valid for the engine settings they were read with"""
+  def __init__(self, path:str, max_size:int=5000, settings:tuple=()):
+    self.path = path
+    self.max_size = max_size
+    self.settings = list(settings)
+    self.entries:OrderedDict[str, str] = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key:str) -> str | None:
+    text = self.entries.get(key)
+    if text is None:
+      self.misses += 1
+      return None
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return text
+
+  def put(self, key:str, text:str):
+    self.entries[key] = text
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.max_size: self.entries.popitem(last=False)
+
+  def load(self) -> bool:
+    if not os.path.exists(self.path): return False
+    try:
+      with open(self.path, "r") as f: data = json.load(f)
+    except (OSError, ValueError):
+      log.warning("OCR cache unreadable, starting empty")
+      return False
+    if data.get("settings") != self.settings: return False # Read with another language/psm/whitelist
+    self.entries = OrderedDict(list(data.get("entries", {}).items())[-self.max_size:])
+    return True
+
+  def save(self):
+    with span("ocr_cache_save"):
+      tmp_path = self.path + ".tmp"
+      with open(tmp_path, "w") as f: json.dump({"settings": self.settings, "entries": self.entries}, f)
+      os.replace(tmp_path, self.path)
+
+  def __len__(self): return len(self.entries)
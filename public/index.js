@@ -1,8 +1,16 @@
+// Thumbnail sizes (longest side in pixels), full size images open on click
+const PREVIEW_SIZE = 512;
+const DETAIL_SIZE = 1024;
+
 // Global state
 let currentFriend = null;
 let currentScreenshot = null;
 let friendsData = [];
+let friendsVersion = null; // Index version friendsData is current to, later loads only fetch changes
 let screenshotsData = [];
+let screenshotsCursor = null; // Where the next page of screenshots starts, null when all are loaded
+let screenshotsTotal = 0;
+const SCREENSHOTS_PAGE_SIZE = 100;
 
 // Token management
 function getToken() {
@@ -129,6 +137,19 @@ function timeAgo(timestamp) {
     }
 }
 
+function screenshotUrl(filename, size = null) {
+    let url = `/api/get_screenshot?filename=${encodeURIComponent(filename)}&token=${getToken()}`;
+    if (size) url += `&size=${size}`;
+    return url;
+}
+
+function showScreenshotImage(imgElement, filename, size) {
+    imgElement.src = screenshotUrl(filename, size);
+    imgElement.title = 'Click to open full size';
+    imgElement.style.cursor = 'pointer';
+    imgElement.onclick = () => window.open(screenshotUrl(filename), '_blank');
+}
+
 // API functions
 async function apiCall(url, options = {}) {
     const token = ensureToken();
@@ -162,22 +183,28 @@ async function apiCall(url, options = {}) {
 async function waitForTask(taskId, maxWaitTime = 30) {
     const startTime = Date.now();
     while (Date.now() - startTime < maxWaitTime * 1000) {
-        try {
-            const result = await apiCall(`/api/task_wait?task_id=${taskId}`);
-            if (result.status === 'completed') {
-                return result.result;
-            } else if (result.status === 'failed') {
-                throw new Error(result.error || 'Task failed');
-            }
-            // Still in progress, wait a bit
-            await new Promise(resolve => setTimeout(resolve, 500));
-        } catch (error) {
-            throw error;
+        // The server holds the request until the task finishes or the wait runs out
+        const remaining = Math.ceil(maxWaitTime - (Date.now() - startTime) / 1000);
+        const wait = Math.max(1, Math.min(25, remaining));
+        const result = await apiCall(`/api/task_wait?task_id=${taskId}&wait=${wait}`);
+        if (result.status === 'completed') {
+            return result.result;
+        } else if (result.status === 'failed' || result.status === 'cancelled') {
+            throw new Error(result.error || 'Task failed');
         }
     }
     throw new Error('Task timed out');
 }
 
+// Stream progress events of a task, returns a function that stops watching
+function watchTask(taskId, onProgress) {
+    const token = getToken();
+    const source = new EventSource(`/api/task_events?task_id=${encodeURIComponent(taskId)}&token=${encodeURIComponent(token)}`);
+    source.addEventListener('progress', event => onProgress(JSON.parse(event.data)));
+    source.addEventListener('done', () => source.close());
+    return () => source.close();
+}
+
 function updateFavoriteButton() {
     const favoriteBtn = document.getElementById('favorite-btn');
     if (!currentFriend) return;
@@ -205,8 +232,16 @@ function toggleCurrentFavorite() {
 // Main functions
 async function loadFriends() {
     try {
-        const data = await apiCall('/api/friends_list');
-        friendsData = data.friends || [];
+        const url = friendsVersion === null ? '/api/friends_list' : `/api/friends_list?since=${friendsVersion}`;
+        const data = await apiCall(url);
+        if (data.full === false) {
+            // Only changed friends were sent, merge them in place
+            const changed = new Map(data.friends.map(friend => [friend.name, friend]));
+            friendsData = friendsData.map(friend => changed.get(friend.name) || friend);
+        } else {
+            friendsData = data.friends || [];
+        }
+        friendsVersion = data.version;
         
         // Update status info
         let lastSyncText = 'Never';
@@ -283,8 +318,17 @@ async function syncFriends() {
         const taskId = response.task_id;
         
         showStatus('sync-status', 'Syncing friends list... This may take a while.', 'loading');
+        const stopWatching = watchTask(taskId, event => {
+            if (event.type === 'indexed') {
+                showStatus('sync-status', `Syncing friends list... ${event.count} found so far`, 'loading');
+            }
+        });
         
-        await waitForTask(taskId, 60); // 60 second timeout for sync
+        try {
+            await waitForTask(taskId, 180); // Sync may queue behind other GUI tasks, then has a 2 minute timeout
+        } finally {
+            stopWatching();
+        }
         
         showStatus('sync-status', 'Sync completed! Reloading friends list...', 'success');
         
@@ -372,9 +416,8 @@ async function loadFriendScreenshot() {
     
     if (currentFriend.last_screenshot) {
         try {
-            const token = getToken();
-            // Add token to screenshot URL
-            imgElement.src = `/api/get_screenshot?filename=${currentFriend.last_screenshot}&token=${token}`;
+            // Thumbnail preview, full size opens on click
+            showScreenshotImage(imgElement, currentFriend.last_screenshot, PREVIEW_SIZE);
             imgElement.style.display = 'block';
             noScreenshotElement.style.display = 'none';
         } catch (error) {
@@ -458,10 +501,15 @@ async function takeScreenshot() {
 }
 
 // Screenshots functions
-async function loadScreenshots() {
+async function loadScreenshots(more = false) {
     try {
-        const data = await apiCall('/api/list_screenshots');
-        screenshotsData = data.screenshots || [];
+        let url = `/api/list_screenshots?limit=${SCREENSHOTS_PAGE_SIZE}`;
+        if (more && screenshotsCursor) url += `&cursor=${encodeURIComponent(screenshotsCursor)}`;
+        const data = await apiCall(url);
+        // Pages come newest first, later pages continue where the last one ended
+        screenshotsData = more ? screenshotsData.concat(data.screenshots || []) : (data.screenshots || []);
+        screenshotsCursor = data.next_cursor;
+        screenshotsTotal = data.total || screenshotsData.length;
         renderScreenshotsList();
     } catch (error) {
         document.getElementById('screenshots-container').innerHTML = 
@@ -477,15 +525,27 @@ function renderScreenshotsList() {
         return;
     }
 
-    // Sort by modification time, newest first
-    const sortedScreenshots = screenshotsData.sort((a, b) => b[1] - a[1]);
-
-    container.innerHTML = sortedScreenshots.map(([filename, timestamp]) => `
+    container.innerHTML = screenshotsData.map(([filename, timestamp]) => `
         <div class="friend-item" onclick="showScreenshotDetail('${filename}')">
             <strong>${filename}</strong><br>
             <small>Created: ${formatTime(timestamp)}</small>
         </div>
     `).join('');
+
+    if (screenshotsCursor) {
+        container.innerHTML += `
+            <button id="load-more-screenshots-btn" onclick="loadMoreScreenshots()">
+                Load more (${screenshotsData.length} of ${screenshotsTotal})
+            </button>
+        `;
+    }
+}
+
+async function loadMoreScreenshots() {
+    const loadMoreBtn = document.getElementById('load-more-screenshots-btn');
+    loadMoreBtn.disabled = true;
+    loadMoreBtn.textContent = 'Loading...';
+    await loadScreenshots(true);
 }
 
 function showScreenshots() {
@@ -516,14 +576,6 @@ async function showScreenshotDetail(filename) {
         }
     }
     
-    // Verify the screenshot exists in our data
-    const screenshotExists = screenshotsData.some(([name]) => name === filename);
-    if (!screenshotExists) {
-        console.error(`Screenshot '${filename}' not found`);
-        showScreenshots();
-        return;
-    }
-    
     // Switch views
     document.getElementById('screenshots-view').classList.add('hidden');
     document.getElementById('screenshot-detail-view').classList.remove('hidden');
@@ -545,7 +597,7 @@ async function showScreenshotDetail(filename) {
         errorElement.classList.remove('hidden');
     };
     
-    imgElement.src = `/api/get_screenshot?filename=${encodeURIComponent(filename)}&token=${getToken()}`;
+    showScreenshotImage(imgElement, filename, DETAIL_SIZE);
 }
 
 async function deleteCurrentScreenshot() {
@@ -595,28 +647,33 @@ async function screenshotAllFriends() {
         
         showStatus('screenshots-task-status', startResult.message + ' (This may take a few minutes)', 'loading');
         
-        // Wait for task completion
-        const result = await waitForTask(startResult.task_id);
-        
-        if (result.status === 'completed') {
-            const results = result.result;
-            const successful = Object.keys(results).filter(name => results[name].error === null).length;
-            const failed = Object.keys(results).length - successful;
-            
-            let message = `Screenshots completed! ${successful} successful`;
-            if (failed > 0) {
-                message += `, ${failed} failed`;
-            }
-            
-            showStatus('screenshots-task-status', message, 'success');
-            
-            // Show details of failed screenshots
-            if (failed > 0) {
-                const failedFriends = Object.keys(results).filter(name => results[name].error !== null);
-                console.log('Failed screenshots:', failedFriends.map(name => `${name}: ${results[name].error}`));
+        const stopWatching = watchTask(startResult.task_id, event => {
+            if (event.type === 'captured') {
+                showStatus('screenshots-task-status', `Taking screenshots... ${event.done}/${event.total} (${event.name})`, 'loading');
             }
-        } else {
-            showStatus('screenshots-task-status', `Screenshot task failed: ${result.error}`, 'error');
+        });
+        
+        // Wait for task completion, the result maps each friend to its screenshot, error and timings
+        let results;
+        try {
+            results = await waitForTask(startResult.task_id, 300);
+        } finally {
+            stopWatching();
+        }
+        const successful = Object.keys(results).filter(name => results[name].error === null).length;
+        const failed = Object.keys(results).length - successful;
+        
+        let message = `Screenshots completed! ${successful} successful`;
+        if (failed > 0) {
+            message += `, ${failed} failed`;
+        }
+        
+        showStatus('screenshots-task-status', message, 'success');
+        
+        // Show details of failed screenshots
+        if (failed > 0) {
+            const failedFriends = Object.keys(results).filter(name => results[name].error !== null);
+            console.log('Failed screenshots:', failedFriends.map(name => `${name}: ${results[name].error}`));
         }
         
         // Reload screenshots list to show new screenshots
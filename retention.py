@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+import logging
+from metrics import STEP_SECONDS
+
+log = logging.getLogger(__name__)
+
+class RetentionPolicy:
+  """Which screenshots to keep, every rule is off when None/empty"""
+  def __init__(self, keep_per_friend:int=None, max_age:float=None, max_bytes:int=None, thinning:list[tuple[float, float]]=()):
+    self.keep_per_friend = keep_per_friend # Newest captures kept per friend
+    self.max_age = max_age # Seconds
+    self.max_bytes = max_bytes # Budget for all screenshots, oldest go first when over it
+    self.thinning = sorted(thinning) # (age, interval): past age keep one capture per interval per friend
+
+  @classmethod
+  def from_config(cls, config:dict) -> "RetentionPolicy":
+    return cls(config["retention_keep_per_friend"], config["retention_max_age"], config["retention_max_bytes"], config["retention_thinning"] or ())
+
+  @property
+  def enabled(self) -> bool:
+    return self.keep_per_friend is not None or self.max_age is not None or self.max_bytes is not None or bool(self.thinning)
+
+  def plan(self, screenshots:list[tuple[str, str|None, float, int]], protected:set[str], now:float) -> list[str]:
+    """Filenames to delete, oldest first. screenshots are (filename, friend, mtime, size), oldest first.
+    Count and thinning rules only apply to screenshots whose friend is known"""
+    delete = set()
+    kept_per_friend:dict[str, int] = {}
+    kept_buckets = set()
+    for filename, friend, mtime, _ in reversed(screenshots): # Newest first
+      age = now - mtime
+      if self.max_age is not None and age > self.max_age:
+        delete.add(filename)
+        continue
+      if friend is None: continue
+      if self.keep_per_friend is not None:
+        kept_per_friend[friend] = kept_per_friend.get(friend, 0) + 1
+        if kept_per_friend[friend] > self.keep_per_friend:
+          delete.add(filename)
+          continue
+      tier = next((i for i in reversed(range(len(self.thinning))) if age >= self.thinning[i][0]), None)
+      if tier is not None:
+        bucket = (friend, tier, int(mtime // self.thinning[tier][1]))
+        if bucket in kept_buckets: delete.add(filename) # Already keeping a newer capture in this interval
+        else: kept_buckets.add(bucket)
+    delete -= protected
+
+    if self.max_bytes is not None:
+      remaining = sum(size for filename, _, _, size in screenshots if filename not in delete)
+      for filename, _, _, size in screenshots:
+        if remaining <= self.max_bytes: break
+        if filename in delete or filename in protected: continue
+        delete.add(filename)
+        remaining -= size
+    return [screenshot[0] for screenshot in screenshots if screenshot[0] in delete]
+
+class RetentionWorker:
+  """Applies the retention policy to screenshot_dir in the background, a bounded batch of deletions at a time"""
+  def __init__(self, findmy):
+    self.findmy = findmy
+    self.wake = threading.Event()
+    self.stopping = threading.Event()
+    self.thread:threading.Thread = None
+    self.last_run:dict = None
+
+  def start(self):
+    if self.thread: return
+    self.thread = threading.Thread(target=self._worker, daemon=True, name="retention")
+    self.thread.start()
+    self.wake.set() # First pass straight away, then every retention_interval
+
+  def stop(self):
+    """Finish the current batch, saving the catalog, and stop"""
+    self.stopping.set()
+    self.wake.set()
+    if self.thread: self.thread.join(30)
+
+  def trigger(self):
+    """Run now instead of waiting for the next interval"""
+    self.wake.set()
+
+  def protected(self) -> set[str]:
+    """Screenshots still referenced as a friend's last screenshot, or still being written"""
+    referenced = { friend["last_screenshot"] for friend in self.findmy.snapshot.friends if friend["last_screenshot"] }
+    with self.findmy.encode_lock: return referenced | set(self.findmy.pending_screenshots)
+
+  def run_once(self) -> dict:
+    started_at = time.time()
+    config = self.findmy.config
+    policy = RetentionPolicy.from_config(config)
+    if not policy.enabled: return {"deleted": 0, "freed_bytes": 0, "objects_removed": 0, "duration": 0}
+    catalog = self.findmy.get_screenshot_catalog()
+    catalog.refresh()
+    screenshots = catalog.oldest_first()
+    sizes = { filename: size for filename, _, _, size in screenshots }
+    plan = policy.plan(screenshots, self.protected(), started_at)
+
+    deleted = 0
+    freed = 0
+    batch_size = max(1, config["retention_batch_size"])
+    for start in range(0, len(plan), batch_size):
+      protected = self.protected() # A capture may have referenced a file since planning
+      for filename in plan[start:start + batch_size]:
+        if filename in protected: continue
+        try: os.remove(os.path.join(catalog.directory, filename))
+        except FileNotFoundError: pass
+        catalog.remove(filename)
+        deleted += 1
+        freed += sizes.get(filename, 0)
+      if self.stopping.is_set(): break
+      if start + batch_size < len(plan): time.sleep(config["retention_batch_pause"]) # Leave the disk to other work for a moment
+    objects_removed = self.findmy.prune_screenshot_objects() if deleted else 0
+    if deleted: catalog.save()
+
+    self.last_run = {"deleted": deleted, "freed_bytes": freed, "objects_removed": objects_removed,
+                     "screenshots": len(catalog), "bytes": catalog.total_bytes,
+                     "duration": round(time.time() - started_at, 3), "finished_at": time.time()}
+    STEP_SECONDS.observe(time.time() - started_at, "retention")
+    if deleted: log.info(f"Retention deleted {deleted} screenshots ({freed} bytes), removed {objects_removed} stored objects")
+    return self.last_run
+
+  def _worker(self):
+    while not self.stopping.is_set():
+      self.wake.wait(self.findmy.config["retention_interval"])
+      self.wake.clear()
+      if self.stopping.is_set(): break
+      try: self.run_once()
+      except Exception: log.exception("Retention run failed")
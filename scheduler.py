@@ -0,0 +1,101 @@
+import time
+import threading
+import logging
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+class CaptureScheduler:
+  """Keeps screenshots fresh by queueing captures of the most overdue friends, and index rebuilds
+  when the index goes stale, as low priority GUI jobs. Rests between jobs so its work stays
+  within scheduler_gui_share of the GUI's time"""
+  def __init__(self, findmy, submit):
+    self.findmy = findmy
+    self.submit = submit # submit(function, args, key, timeout) -> queued task, anything with a finished property
+    self.wake = threading.Event()
+    self.stopping = threading.Event()
+    self.thread:threading.Thread = None
+    self.job = None
+    self.job_kind:str = None
+    self.next_allowed = 0.0 # Earliest time the next job may be queued
+    self.gui_time = 0.0 # Total seconds scheduled jobs have held the GUI
+    self.jobs_run = 0
+
+  def start(self):
+    if self.thread: return
+    self.thread = threading.Thread(target=self._worker, daemon=True, name="scheduler")
+    self.thread.start()
+
+  def stop(self):
+    """Queue no more jobs, a job already queued still runs"""
+    self.stopping.set()
+    self.wake.set()
+    if self.thread: self.thread.join(5)
+
+  def refresh_interval(self, friend) -> float:
+    return friend["refresh_interval"] or self.findmy.config["refresh_interval"]
+
+  def overdue(self, now:float=None) -> list[tuple[str, float]]:
+    """(name, score) of friends due a capture, most overdue first.
+    score is time since the last capture over the friend's refresh interval, inf when never captured"""
+    now = now or time.time()
+    scores = []
+    for friend in self.findmy.snapshot.friends:
+      last = friend["last_screenshot_at"]
+      score = float("inf") if last is None else (now - last) / self.refresh_interval(friend)
+      if score >= 1: scores.append((friend["name"], score))
+    scores.sort(key=lambda item: -item[1])
+    return scores
+
+  def index_stale(self, now:float=None) -> bool:
+    snapshot = self.findmy.snapshot
+    if not snapshot.friends or not snapshot.last_sync: return True
+    age = (now or time.time()) - datetime.fromisoformat(snapshot.last_sync).timestamp()
+    return age > self.findmy.config["index_stale_time"]
+
+  def _timed(self, function, *args):
+    """Run a job on the GUI thread, recording how long it held the GUI and when the next may start"""
+    started_at = time.time()
+    try: return function(*args)
+    finally:
+      took = time.time() - started_at
+      share = min(max(self.findmy.config["scheduler_gui_share"], 0.01), 1.0)
+      self.gui_time += took
+      self.jobs_run += 1
+      self.next_allowed = time.time() + took * (1 / share - 1)
+
+  def tick(self):
+    """Queue the next job if the previous one is done and the time share allows it"""
+    if self.job and not self.job.finished: return
+    self.job = None
+    now = time.time()
+    if now < self.next_allowed: return
+    if self.index_stale(now):
+      self.job_kind = "sync"
+      self.job = self.submit(self._timed, (self.findmy.build_index,), "sync", 120)
+      return
+    names = [name for name, _ in self.overdue(now)[:max(1, self.findmy.config["scheduler_batch"])]]
+    if not names: return
+    self.job_kind = "capture"
+    self.job = self.submit(self._timed, (self.findmy.capture_friends, names), "scheduled_capture", 60 * len(names))
+
+  def status(self) -> dict:
+    overdue = self.overdue()
+    return {
+      "enabled": self.findmy.config["scheduler_enabled"],
+      "index_stale": self.index_stale(),
+      "overdue": len(overdue),
+      "most_overdue": [{"name": name, "score": None if score == float("inf") else round(score, 2)} for name, score in overdue[:10]],
+      "job": self.job_kind if self.job and not self.job.finished else None,
+      "next_allowed_in": round(max(0.0, self.next_allowed - time.time()), 1),
+      "gui_time": round(self.gui_time, 1),
+      "jobs_run": self.jobs_run,
+    }
+
+  def _worker(self):
+    while not self.stopping.is_set():
+      self.wake.wait(self.findmy.config["scheduler_tick"])
+      self.wake.clear()
+      if self.stopping.is_set() or not self.findmy.config["scheduler_enabled"]: continue
+      try: self.tick()
+      except Exception: log.exception("Scheduler check failed")
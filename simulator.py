@@ -0,0 +1,144 @@
+import time
+import zlib
+import cv2
+import numpy as np
+from backends import ScreenBackend
+
+FIRST_NAMES = ["Alice", "Ben", "Chloe", "Daniel", "Emma", "Felix", "Grace", "Henry", "Isla", "Jack",
+               "Kate", "Liam", "Maya", "Noah", "Olivia", "Peter", "Quinn", "Ruby", "Sam", "Tara",
+               "Uma", "Victor", "Willow", "Xavier", "Yara", "Zach", "Amber", "Bruno", "Clara", "Dylan",
+               "Elena", "Finn", "Gemma", "Hugo", "Ivy", "Jonas", "Leah", "Marco", "Nina", "Oscar"]
+LAST_NAMES = ["Adams", "Baker", "Carter", "Dawson", "Evans", "Fisher", "Garcia", "Hughes", "Irving", "Jensen",
+              "Keller", "Lopez", "Moore", "Nolan", "Owens", "Parker", "Quincy", "Reed", "Stone", "Turner",
+              "Underwood", "Vance", "Walsh", "Young", "Zimmer", "Archer", "Brooks", "Collins", "Dixon", "Ellis",
+              "Foster", "Grant", "Hayes", "Knight", "Lawson", "Mason", "Norris", "Porter", "Ramsey", "Shaw"]
+
+def simulated_names(count:int) -> list[str]:
+  """count distinct, readable names"""
+  if count > len(FIRST_NAMES) * len(LAST_NAMES): raise ValueError(f"At most {len(FIRST_NAMES) * len(LAST_NAMES)} simulated names")
+  return [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES) + i) % len(LAST_NAMES)]}" for i in range(count)]
+
+class SimulatedFindMy(ScreenBackend):
+  """Headless stand-in for the Find My app, rendered in memory.
+  A scrollable friends list and a map per friend, with a configurable list length, scroll rate and render latency"""
+  def __init__(self, friends:int|list[str]=50, row_height:int=40, list_size:tuple[int, int]=(300, 400), map_size:tuple[int, int]=(600, 400),
+               pixels_per_unit:float=2.5, render_latency:float=0.0, map_latency:float=0.0, seed:int=0):
+    self.names = simulated_names(friends) if isinstance(friends, int) else list(friends)
+    self.row_height = row_height
+    self.pixels_per_unit = pixels_per_unit # List pixels moved per scroll unit
+    self.render_latency = render_latency # Seconds before a scroll shows up in captures
+    self.map_latency = map_latency # Seconds before a selected friend's map shows up
+    self.seed = seed
+    self.padding = 10
+
+    # Screen layout: people button top left, list below it, map to the right
+    self.people_button = (20, 20)
+    self.list_region = (20, 60, list_size[0], list_size[1])
+    self.map_region = (list_size[0] + 40, 60, map_size[0], map_size[1])
+    self.screen_size = (self.map_region[0] + map_size[0] + 20, 60 + max(list_size[1], map_size[1]) + 20)
+
+    self.list_image = self.render_list()
+    self.max_offset = max(0, self.list_image.shape[0] - list_size[1])
+    self.pins:dict[str, tuple[int, int]] = {} # name -> pin position on their map, moved by move_friend
+    self.maps:dict[str, np.ndarray] = {}
+    self.mouse = (0, 0)
+    self.offset = 0 # Current scroll, pixels
+    self.shown_offset = 0 # What captures show until render_latency has passed
+    self.scrolled_at = 0.0
+    self.selected:str = None
+    self.shown_selected:str = None
+    self.selected_at = 0.0
+    self.stats = {"captures": 0, "clicks": 0, "scrolls": 0}
+
+  def regions(self) -> dict:
+    """Config entries pointing FindMy at the simulated app"""
+    return {"friends_list_region": self.list_region, "map_region": self.map_region, "people_button": self.people_button}
+
+  def render_list(self) -> np.ndarray:
+    height = 2 * self.padding + len(self.names) * self.row_height
+    img = np.full((height, self.list_region[2], 3), 255, np.uint8)
+    for i, name in enumerate(self.names):
+      baseline = self.padding + i * self.row_height + int(self.row_height * 0.65)
+      cv2.putText(img, name, (8, baseline), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1, cv2.LINE_AA)
+    return img
+
+  def friend_map(self, name:str|None) -> np.ndarray:
+    """Map shown while name is selected, the same for the same pin position"""
+    if name not in self.maps:
+      width, height = self.map_region[2], self.map_region[3]
+      rng = np.random.default_rng(self.seed + zlib.crc32((name or "").encode()))
+      img = np.empty((height, width, 3), np.uint8)
+      img[:] = (232, 228, 218)
+      if name is not None:
+        for _ in range(6): # Roads
+          start = tuple(int(v) for v in rng.integers(0, (width, height)))
+          end = tuple(int(v) for v in rng.integers(0, (width, height)))
+          cv2.line(img, start, end, (255, 255, 255), int(rng.integers(4, 10)))
+        cv2.rectangle(img, tuple(int(v) for v in rng.integers(0, (width // 2, height // 2))), tuple(int(v) for v in rng.integers((width // 2, height // 2), (width, height))), (190, 220, 170), -1) # Park
+        x, y = self.pins.get(name, (width // 2, height // 2))
+        cv2.circle(img, (x, y), 16, (255, 255, 255), -1)
+        cv2.circle(img, (x, y), 13, (220, 40, 40), -1)
+      self.maps[name] = img
+    return self.maps[name]
+
+  def move_friend(self, name:str, dx:int, dy:int):
+    """Move a friend's pin, their next map capture differs"""
+    x, y = self.pins.get(name, (self.map_region[2] // 2, self.map_region[3] // 2))
+    self.pins[name] = (x + dx, y + dy)
+    self.maps.pop(name, None)
+
+  def _update_shown(self):
+    now = time.time()
+    if now - self.scrolled_at >= self.render_latency: self.shown_offset = self.offset
+    if now - self.selected_at >= self.map_latency: self.shown_selected = self.selected
+
+  def render_screen(self) -> np.ndarray:
+    width, height = self.screen_size
+    screen = np.full((height, width, 3), 246, np.uint8)
+    left, top, list_width, list_height = self.list_region
+    screen[top:top + list_height, left:left + list_width] = self.list_image[self.shown_offset:self.shown_offset + list_height]
+    left, top, map_width, map_height = self.map_region
+    screen[top:top + map_height, left:left + map_width] = self.friend_map(self.shown_selected)
+    return screen
+
+  def capture(self, region:tuple[int, int, int, int], reuse:bool=False) -> np.ndarray:
+    self.stats["captures"] += 1
+    self._update_shown()
+    region = tuple(region)
+    left, top, width, height = region
+    # Frames that aren't kept can be read-only views of what is already rendered
+    if region == self.list_region: img = self.list_image[self.shown_offset:self.shown_offset + height]
+    elif region == self.map_region: img = self.friend_map(self.shown_selected)
+    else: return self.render_screen()[top:top + height, left:left + width].copy()
+    if not reuse: return img.copy()
+    img = img.view()
+    img.flags.writeable = False
+    return img
+
+  def in_list(self, x:int, y:int) -> bool:
+    left, top, width, height = self.list_region
+    return left <= x < left + width and top <= y < top + height
+
+  def click(self, x:int, y:int):
+    self.stats["clicks"] += 1
+    self.mouse = (x, y)
+    self._update_shown()
+    if (x, y) == self.people_button: selected = None
+    elif self.in_list(x, y):
+      row = (self.shown_offset + y - self.list_region[1] - self.padding) // self.row_height
+      selected = self.names[row] if 0 <= row < len(self.names) else self.selected
+    else: return
+    if selected != self.selected:
+      self.selected = selected
+      self.selected_at = time.time()
+
+  def move_to(self, x:int, y:int): self.mouse = (x, y)
+
+  def scroll(self, units:int):
+    self.stats["scrolls"] += 1
+    if not self.in_list(*self.mouse): return
+    self._update_shown()
+    self.offset = int(min(max(self.offset - units * self.pixels_per_unit, 0), self.max_offset))
+    self.scrolled_at = time.time()
+
+  def position(self) -> tuple[int, int]: return self.mouse
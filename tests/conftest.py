@@ -0,0 +1,24 @@
+import os
+import sys
+import json
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import findmy
+from benchmark import stub_ocr
+from simulator import SimulatedFindMy
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+  """FindMy driving a simulator, with stub OCR and its index, caches and screenshots in a temp directory"""
+  monkeypatch.chdir(tmp_path)
+  bots = []
+  def make(sim:SimulatedFindMy, **config) -> findmy.FindMy:
+    monkeypatch.setattr(findmy, "ocr_row", stub_ocr(sim))
+    with open(findmy.CONFIG_FILE, "w") as f: json.dump({**sim.regions(), "ocr_workers": 0, **config}, f)
+    bot = findmy.FindMy(sim)
+    bots.append(bot)
+    return bot
+  yield make
+  for bot in bots: bot.shutdown()
@@ -0,0 +1,20 @@
+from names import NameIndex, match_names
+
+NAMES = ["Elena Foster", "Uma Collins", "Jonathan Smith", "J Smith", "Ann Lee", "Ann Lea"]
+
+def test_lookup_tolerates_one_ocr_error():
+  index = NameIndex(NAMES)
+  assert index.lookup("Jonathan Smtih") == "Jonathan Smith"
+  assert index.lookup("Elena Fostr") == "Elena Foster"
+  assert index.lookup("uma") == "Uma Collins"
+
+def test_lookup_rejects_other_people():
+  index = NameIndex(NAMES)
+  assert index.lookup("Clara Foster") is None
+  assert index.lookup("Sam Collins") is None
+  assert index.lookup("K Smith") is None # One edit, but the whole first name
+  assert index.lookup("Ann Lei") is None # Equally close to two names
+
+def test_match_names_carries_over_only_unambiguous_renames():
+  pairs = match_names(["Elena Foster", "Uma Collins", "Ann Lee"], ["Elena Fostar", "Sam Collins", "Ann Lea", "Ann Leo"])
+  assert pairs == {"Elena Fostar": "Elena Foster"}
@@ -0,0 +1,102 @@
+import os
+import threading
+import pytest
+import findmy
+from simulator import SimulatedFindMy
+
+@pytest.mark.parametrize("render_latency", [0.0, 0.12])
+def test_build_index_finds_every_friend(make_bot, render_latency):
+  # 0.12 redraws slower than SCROLL_WAIT, an unchanged frame there isn't the end of the list
+  sim = SimulatedFindMy(30, render_latency=render_latency)
+  bot = make_bot(sim)
+  summary = bot.build_index()
+  assert sorted(bot.friends_index) == sorted(findmy.FindMy.clean_name(name) for name in sim.names)
+  assert summary["stop_reason"] == "list_stopped"
+
+def test_select_friends(make_bot):
+  sim = SimulatedFindMy(30)
+  bot = make_bot(sim)
+  bot.build_index()
+  for name in (sim.names[0], sim.names[17], sim.names[-1], sim.names[3]): # Down and back up the list
+    key = bot.find_friend(name)
+    assert key
+    assert bot.click_friend(key, True)
+    assert sim.selected == name
+
+def test_sweep_captures_every_friend(make_bot):
+  sim = SimulatedFindMy(12)
+  bot = make_bot(sim)
+  bot.build_index()
+  results = bot.capture_friends()
+  assert len(results) == len(sim.names)
+  for result in results.values():
+    assert result["error"] is None
+    assert bot.wait_for_screenshot(result["screenshot"])
+    assert os.path.exists(os.path.join(bot.config["screenshot_dir"], result["screenshot"]))
+
+def test_moved_pin_gives_new_screenshot(make_bot):
+  sim = SimulatedFindMy(10)
+  bot = make_bot(sim)
+  bot.build_index()
+  name = sim.names[4]
+  key = bot.find_friend(name)
+  assert bot.click_friend(key, True)
+  first = bot.screenshot_map()
+  first_hash = bot.friends_index[key].last_screenshot_hash
+  assert bot.screenshot_map() == first # Unchanged map keeps its screenshot
+
+  sim.move_friend(name, 3, 2) # A few pixels is still a new location
+  assert bot.click_friend(key, True)
+  bot.screenshot_map()
+  assert bot.friends_index[key].last_screenshot_hash != first_hash
+
+def test_cancelled_scroll_rehomes_next_selection(make_bot):
+  sim = SimulatedFindMy(30)
+  bot = make_bot(sim)
+  bot.build_index()
+  assert bot.click_friend(bot.find_friend(sim.names[25]), True)
+
+  # Cancel a selection right after its first scroll, the list is left somewhere in between
+  bot.cancel_event = threading.Event()
+  scroll = sim.scroll
+  def scroll_then_cancel(units):
+    scroll(units)
+    bot.cancel_event.set()
+  sim.scroll = scroll_then_cancel
+  with pytest.raises(findmy.TaskCancelled): bot.click_friend(bot.find_friend(sim.names[2]), True)
+  sim.scroll = scroll
+  bot.cancel_event = None
+
+  assert bot.click_friend(bot.find_friend(sim.names[10]), True)
+  assert sim.selected == sim.names[10]
+
+def test_prune_keeps_objects_queued_for_reuse(make_bot):
+  sim = SimulatedFindMy(5)
+  bot = make_bot(sim, encoder_workers=1)
+  bot.build_index()
+  assert bot.click_friend(bot.find_friend(sim.names[1]), True)
+  first = bot.screenshot_map("first.png")
+  assert bot.wait_for_screenshot(first)
+  os.remove(os.path.join(bot.config["screenshot_dir"], first)) # Only the stored object is left
+
+  # Reuse the object while the encoder is busy, a prune in between must keep it
+  gate = threading.Event()
+  bot.get_encoder_pool().submit(gate.wait)
+  try:
+    second = bot.screenshot_map("second.png")
+    assert bot.prune_screenshot_objects() == 0
+  finally: gate.set()
+  assert bot.wait_for_screenshot(second)
+  assert os.path.exists(os.path.join(bot.config["screenshot_dir"], second))
+
+def test_screenshots_without_hard_links(make_bot, monkeypatch):
+  def no_link(*_): raise OSError("Hard links not supported")
+  monkeypatch.setattr(os, "link", no_link)
+  sim = SimulatedFindMy(5)
+  bot = make_bot(sim)
+  bot.build_index()
+  assert bot.click_friend(bot.find_friend(sim.names[2]), True)
+  filename = bot.screenshot_map()
+  assert bot.wait_for_screenshot(filename)
+  bot.prune_screenshot_objects()
+  assert os.path.exists(os.path.join(bot.config["screenshot_dir"], filename))
@@ -1,17 +1,38 @@
-from flask import Flask, request, send_from_directory, send_file, jsonify
+from flask import Flask, Response, request, send_from_directory, send_file, jsonify, g
 import time
 import os
+import sys
+import json
+import signal
+import logging
 
 # For tasks
 import threading
+import heapq
 import uuid
 from datetime import datetime
 from enum import Enum
 
-from findmy import FindMy
+from findmy import FindMy, MIMETYPES, TaskCancelled
+from catalog import InvalidCursor
+from retention import RetentionPolicy, RetentionWorker
+from scheduler import CaptureScheduler
+from locations import SAMPLE_FORMAT
+from metrics import REGISTRY, configure_logging
+
+log = logging.getLogger("web_host")
 
 app = Flask(__name__)
-findmy = FindMy()
+# Read replica: serves friends_index.json and screenshot_dir as another web host writes them, GUI and write endpoints are refused
+READ_ONLY = bool(os.environ.get("FINDMY_READ_ONLY"))
+if READ_ONLY: findmy = FindMy(read_only=True)
+elif os.environ.get("FINDMY_SIMULATOR"):
+  # Headless run against the in-memory simulator, FINDMY_SIMULATOR is the number of friends
+  from simulator import SimulatedFindMy
+  simulator = SimulatedFindMy(int(os.environ["FINDMY_SIMULATOR"]))
+  findmy = FindMy(simulator)
+  findmy.config.update(simulator.regions())
+else: findmy = FindMy()
 
 PORT = 5050
 PUBLIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
@@ -22,76 +43,239 @@ class TaskStatus(Enum):
   IN_PROGRESS = 'in_progress'
   COMPLETED = 'completed'
   FAILED = 'failed'
+  CANCELLED = 'cancelled'
+
+# GUI task priorities, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SYNC = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_SYNC: "sync", PRIORITY_BULK: "bulk"}
+
+HTTP_SECONDS = REGISTRY.histogram("findmy_http_request_seconds", "API response time, up to the first byte for streamed responses", ("endpoint", "method", "status"))
+TASK_QUEUE_SECONDS = REGISTRY.histogram("findmy_task_queue_seconds", "Time GUI tasks waited for the GUI thread", ("priority",))
+TASK_RUN_SECONDS = REGISTRY.histogram("findmy_task_run_seconds", "Time GUI tasks ran, including tasks run ahead of them", ("task", "status"))
+TASKS_MERGED = REGISTRY.counter("findmy_tasks_merged_total", "Tasks merged into an identical queued task", ("priority",))
+
 class Task:
   tasks:dict[str, 'Task'] = {}
   def __init__(self, task_function, *args, **kwargs):
     self.task_id = str(uuid.uuid4()) # Generate unique task ID
     self.task_function = task_function
+    self.name:str = getattr(task_function, "__name__", "task") # Metrics label
     self.args = args
     self.kwargs = kwargs
     self.result = None
 
     self.timeout:float = None
-    self.thread:threading.Thread = None
+    self.timeout_timer:threading.Timer = None # Running while the task holds the GUI, paused while others run inside it
+    self.deadline:float = None
+    self.priority:int = PRIORITY_INTERACTIVE
+    self.coalesce_key:str = None # Queued tasks with the same key are merged
+    self.cancel_event = threading.Event() # Checked by FindMy between scroll and click steps
+    self.condition = threading.Condition() # Notified on every status change and progress event
+    self.events:list[dict] = [] # Progress reported while running
 
     self.status:TaskStatus = TaskStatus.PENDING
     self.error:str = None
     self.created_at:float = time.time()
     self.started_at:float = None
     self.completed_at:float = None
+  @property
+  def finished(self) -> bool: return self.status not in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS)
+  def set_status(self, status:TaskStatus, error:str = None):
+    with self.condition:
+      if error and not self.error: self.error = error
+      self.status = status
+      if status == TaskStatus.IN_PROGRESS and not self.started_at: self.started_at = time.time()
+      if self.finished: self.completed_at = time.time()
+      self.condition.notify_all()
+  def emit(self, event:dict):
+    """Record a progress event and wake anyone streaming this task"""
+    with self.condition:
+      self.events.append({**event, "time": time.time()})
+      self.condition.notify_all()
   def _run_wrapper(self):
-    self.started_at = time.time()
-    self.status = TaskStatus.IN_PROGRESS
+    self.set_status(TaskStatus.IN_PROGRESS)
     try:
       self.result = self.task_function(*self.args, **self.kwargs)
-      self.status = TaskStatus.COMPLETED
+      self.set_status(TaskStatus.COMPLETED)
+    except TaskCancelled as e:
+      self.set_status(TaskStatus.FAILED if self.error == "Task timed out" else TaskStatus.CANCELLED, str(e))
     except Exception as e:
-      self.status = TaskStatus.FAILED
-      self.error = str(e)
-    self.completed_at = time.time()
+      self.set_status(TaskStatus.FAILED, str(e))
   def run(self): # Return result directly
     self._run_wrapper()
     return self.result
-  def run_async(self, timeout:float=None) -> str: # Return task ID
-    self.timeout = timeout
-    self.thread = threading.Thread(target=self._run_wrapper, daemon=True)
-    self.thread.start()
-    return self.task_id
-  def get_request_return(self, wait_for_result:bool = True, step_interval:float = 0.2) -> tuple[dict, int]:
-    while(wait_for_result and self.status == TaskStatus.IN_PROGRESS):
-      time.sleep(step_interval)
-      if self.timeout and (time.time() - self.started_at) > self.timeout:
-        self.status = TaskStatus.FAILED
-        self.error = "Task timed out"
-        self.thread = None
-        print(f"Task {self.task_id} timed out, MAY still be running in background")
-        break
+  def cancel(self, reason:str = "Task cancelled"):
+    if self.status not in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS): return
+    if not self.error: self.error = reason
+    self.cancel_event.set()
+  def get_request_return(self, wait_for_result:bool = True, max_wait:float = 30) -> tuple[dict, int]:
+    if wait_for_result:
+      with self.condition: self.condition.wait_for(lambda: self.finished, timeout=max_wait)
     if(self.status == TaskStatus.PENDING): return {"status": self.status.value, "message": "Task is pending start"}, 202
     if(self.status == TaskStatus.IN_PROGRESS): return {"status": self.status.value, "message": "Task is in progress"}, 202
     if(self.status == TaskStatus.COMPLETED): return {"status": self.status.value, "message": "Task completed", "result": self.result}, 200
     if(self.status == TaskStatus.FAILED): return {"status": self.status.value, "message": "Task failed", "error": self.error}, 500
+    if(self.status == TaskStatus.CANCELLED): return {"status": self.status.value, "message": "Task cancelled", "error": self.error}, 409
   @staticmethod
-  def get_task_result(task_id: str|None, wait_for_result:bool = True, step_interval:float = 0.2) -> tuple[dict, int]:
+  def get_task_result(task_id: str|None, wait_for_result:bool = True, max_wait:float = 30) -> tuple[dict, int]:
     if(not task_id): return {"error": "task_id parameter is required"}, 400
     task = Task.get_task(task_id)
     if not task: return {"error": "Task not found"}, 404
-    return task.get_request_return(wait_for_result, step_interval)
+    return task.get_request_return(wait_for_result, max_wait)
   @staticmethod
   def create_task(task_function, *args, **kwargs) -> 'Task':
     task = Task(task_function, *args, **kwargs)
     Task.tasks[task.task_id] = task
-    print(f"Created task {task.task_id} - Total tasks: {len(Task.tasks)}")  # Debug
+    log.debug(f"Created task {task.task_id} ({task.name}) - Total tasks: {len(Task.tasks)}")
     return task
   @staticmethod
   def get_task(task_id: str) -> 'Task | None':
-    print(f"Looking for task {task_id} - Available tasks: {list(Task.tasks.keys())}")  # Debug
     return Task.tasks.get(task_id, None)
   @staticmethod
   def cleanup_old_tasks(max_age_seconds: int = 43200): # Older than 12 hours
     current_time = time.time()
-    to_delete = [task_id for task_id, task in Task.tasks.items() if (current_time - task.created_at) > max_age_seconds]
+    to_delete = [task_id for task_id, task in Task.tasks.items() if (current_time - task.created_at) > max_age_seconds
+                 and task.status not in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS)]
     for task_id in to_delete: del Task.tasks[task_id]
 
+class GuiExecutor:
+  """Runs every task that drives the GUI on one worker thread, by priority then submission order.
+  Queued duplicates are merged, and a bulk task lets waiting higher priority tasks run between friends"""
+  def __init__(self, findmy:FindMy):
+    self.findmy = findmy
+    self.queue:list[tuple[int, int, Task]] = [] # heap of (priority, sequence, task)
+    self.queued:dict[str, Task] = {} # coalesce key -> queued task
+    self.sequence = 0
+    self.condition = threading.Condition()
+    self.current:Task = None
+    self.thread:threading.Thread = None
+    findmy.yield_hook = self.run_preempting
+
+  def submit(self, task:Task, priority:int, timeout:float = None, coalesce_key:str = None) -> Task:
+    """Queue a task, returns the already queued task instead when one has the same key and nothing would run between them"""
+    with self.condition:
+      if coalesce_key and coalesce_key in self.queued and self._runs_last(self.queued[coalesce_key], priority):
+        log.debug(f"Merged task {task.task_id} into queued {self.queued[coalesce_key].task_id} ({coalesce_key})")
+        TASKS_MERGED.inc(PRIORITY_NAMES.get(priority, priority))
+        del Task.tasks[task.task_id]
+        return self.queued[coalesce_key]
+      task.priority = priority
+      task.timeout = timeout
+      task.coalesce_key = coalesce_key
+      if coalesce_key: self.queued[coalesce_key] = task
+      heapq.heappush(self.queue, (priority, self.sequence, task))
+      self.sequence += 1
+      if not self.thread:
+        self.thread = threading.Thread(target=self._worker, daemon=True, name="gui")
+        self.thread.start()
+      self.condition.notify()
+    return task
+
+  def _runs_last(self, queued:Task, priority:int) -> bool:
+    """Whether a task submitted now at priority would run right after the queued one.
+    A select queued in between would change what a merged screenshot captures"""
+    position = next((entry_priority, sequence) for entry_priority, sequence, entry in self.queue if entry is queued)
+    return not any(position < (entry_priority, sequence) < (priority, self.sequence) for entry_priority, sequence, _ in self.queue)
+
+  def cancel(self, task:Task) -> bool:
+    """Cancel a queued task, or ask the running one to stop at its next step"""
+    with self.condition:
+      if task.status == TaskStatus.PENDING:
+        self.queue = [entry for entry in self.queue if entry[2] is not task]
+        heapq.heapify(self.queue)
+        if self.queued.get(task.coalesce_key) is task: del self.queued[task.coalesce_key]
+        task.set_status(TaskStatus.CANCELLED, "Task cancelled")
+        return True
+    if task.status == TaskStatus.IN_PROGRESS:
+      task.cancel()
+      return True
+    return False
+
+  def queue_depth(self) -> int:
+    with self.condition: return len(self.queue)
+
+  def _next(self, below_priority:int = None) -> Task | None:
+    with self.condition:
+      if not self.queue: return None
+      if below_priority is not None and self.queue[0][0] >= below_priority: return None
+      _, _, task = heapq.heappop(self.queue)
+      if self.queued.get(task.coalesce_key) is task: del self.queued[task.coalesce_key]
+      task.set_status(TaskStatus.IN_PROGRESS) # Taken off the queue, so cancel() now signals it instead
+    TASK_QUEUE_SECONDS.observe(task.started_at - task.created_at, PRIORITY_NAMES.get(task.priority, task.priority))
+    return task
+
+  def _execute(self, task:Task):
+    previous, previous_event, previous_progress = self.current, self.findmy.cancel_event, self.findmy.progress_callback
+    self.current = task
+    self.findmy.cancel_event = task.cancel_event
+    self.findmy.progress_callback = task.emit
+    # A task run ahead of another inside it doesn't use up the outer task's time
+    paused = None
+    if previous and previous.timeout_timer:
+      previous.timeout_timer.cancel()
+      paused = previous.deadline - time.time()
+    if task.timeout: self._start_timeout(task, task.timeout)
+    try: task._run_wrapper()
+    finally:
+      if task.timeout_timer:
+        task.timeout_timer.cancel()
+        task.timeout_timer = None
+      TASK_RUN_SECONDS.observe(time.time() - task.started_at, task.name, task.status.value)
+      self.current, self.findmy.cancel_event, self.findmy.progress_callback = previous, previous_event, previous_progress
+      if paused is not None: self._start_timeout(previous, paused)
+
+  def _start_timeout(self, task:Task, seconds:float):
+    task.deadline = time.time() + seconds
+    task.timeout_timer = threading.Timer(max(0.0, seconds), task.cancel, ("Task timed out",))
+    task.timeout_timer.daemon = True
+    task.timeout_timer.start()
+
+  def run_preempting(self):
+    """Called by FindMy at safe points in long tasks, runs queued tasks that outrank the current one"""
+    if not self.current or threading.current_thread() is not self.thread: return
+    while True:
+      task = self._next(below_priority=self.current.priority)
+      if not task: return
+      log.info(f"Running task {task.task_id} ({task.name}) ahead of {self.current.task_id} ({self.current.name})")
+      self._execute(task)
+
+  def _worker(self):
+    while True:
+      with self.condition:
+        while not self.queue: self.condition.wait()
+      task = self._next()
+      if task: self._execute(task)
+
+gui = GuiExecutor(findmy)
+retention = RetentionWorker(findmy)
+
+def count_tasks() -> dict:
+  counts = { (status.value,): 0 for status in TaskStatus }
+  for task in list(Task.tasks.values()): counts[(task.status.value,)] += 1
+  return counts
+
+REGISTRY.gauge("findmy_task_queue_depth", "GUI tasks waiting to run", function=gui.queue_depth)
+REGISTRY.gauge("findmy_tasks", "Tracked tasks by status", ("status",), count_tasks)
+REGISTRY.gauge("findmy_friends_indexed", "Friends in the published index", function=lambda: len(findmy.snapshot.friends))
+REGISTRY.gauge("findmy_index_version", "Version of the published index", function=lambda: findmy.snapshot.version)
+REGISTRY.gauge("findmy_pending_screenshots", "Screenshots still being encoded", function=lambda: len(findmy.pending_screenshots))
+REGISTRY.gauge("findmy_screenshots", "Screenshots in the catalog", function=lambda: len(findmy.screenshot_catalog) if findmy.screenshot_catalog else 0)
+REGISTRY.gauge("findmy_screenshot_bytes", "Bytes used by cataloged screenshots", function=lambda: findmy.screenshot_catalog.total_bytes if findmy.screenshot_catalog else 0)
+
+@app.before_request
+def start_request_timer():
+  g.request_started_at = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+  started_at = g.get("request_started_at")
+  if started_at is not None:
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched" # Route patterns, not raw paths, keep the label set small
+    HTTP_SECONDS.observe(time.perf_counter() - started_at, endpoint, request.method, response.status_code)
+  return response
+
 def get_arg_or_param(name: str, default=None, type=None):
   """Get value from request headers, URL parameters, or JSON body"""
   # Try headers first
@@ -120,6 +304,18 @@ def check_token():
   if(findmy.config.get("access_token") and token != findmy.config["access_token"]): return False
   return True
 
+def read_only_error():
+  return jsonify({"error": "Read-only mode, send GUI and write requests to the primary web host"}), 405
+
+def follow_index():
+  """Read-only mode: pick up index and screenshot changes made by the primary"""
+  while True:
+    time.sleep(findmy.config["read_only_refresh_interval"])
+    try:
+      if findmy.index_store.changed(): findmy.load_index()
+      findmy.get_screenshot_catalog().refresh()
+    except Exception: log.exception("Index refresh failed")
+
 @app.route('/')
 def index():
   return send_from_directory(PUBLIC_DIR, 'index.html')
@@ -131,25 +327,62 @@ def serve_js():
 @app.route('/api/friends_list', methods=['GET','POST'])
 def api_friends_list():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
-  friends = findmy.get_all_friends()
+  snapshot = findmy.snapshot # Consistent view, even while a rebuild is running
+  selected_friend = findmy.currently_selected_friend
+  since = get_arg_or_param("since", type=int) # Only friends changed after this version
+  changed = snapshot.changed_since(since) if since is not None else None
   result = {
-    "last_sync": findmy.last_sync,
+    "version": snapshot.version,
+    "full": changed is None, # False when friends only holds changes, merge them by name
+    "last_sync": snapshot.last_sync,
     "friends": [],
-    "selected_friend": findmy.currently_selected_friend
+    "selected_friend": selected_friend
   }
-  for friend in friends:
+  for friend in (snapshot.friends if changed is None else changed):
     result["friends"].append({
-      "name": friend.name,
-      "last_screenshot": friend.last_screenshot if friend.last_screenshot else None,
-      "last_screenshot_time": friend.last_screenshot_at if friend.last_screenshot_at else None
+      "name": friend["name"],
+      "last_screenshot": friend["last_screenshot"] if friend["last_screenshot"] else None,
+      "last_screenshot_time": friend["last_screenshot_at"] if friend["last_screenshot_at"] else None,
+      "version": friend["version"]
     })
-  return jsonify(result)
+  response = jsonify(result)
+  response.set_etag(f"{snapshot.version}-{since}-{selected_friend}")
+  response.cache_control.no_cache = True # Always revalidate, unchanged lists come back as 304
+  response.cache_control.private = True
+  return response.make_conditional(request)
 
 @app.route('/api/task_wait', methods=['GET','POST'])
 def api_sync_wait():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
   task_id = get_arg_or_param("task_id", type=str)
-  return Task.get_task_result(task_id)
+  wait = min(max(get_arg_or_param("wait", 30, type=float), 0), 60) # Long-poll seconds, returns as soon as the task finishes
+  return Task.get_task_result(task_id, wait > 0, wait)
+
+@app.route('/api/task_events', methods=['GET'])
+def api_task_events():
+  """Server-Sent Events stream of a task's progress, ending with its final status"""
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  task_id = get_arg_or_param("task_id", type=str)
+  if(not task_id): return jsonify({"error": "task_id parameter is required"}), 400
+  task = Task.get_task(task_id)
+  if(not task): return jsonify({"error": "Task not found"}), 404
+  since = get_arg_or_param("Last-Event-ID", get_arg_or_param("since", 0, type=int), type=int) # Resume after a reconnect
+
+  def stream():
+    index = since
+    while True:
+      with task.condition:
+        task.condition.wait_for(lambda: len(task.events) > index or task.finished, timeout=15)
+        events, finished = task.events[index:], task.finished
+      for event in events:
+        index += 1
+        yield f"id: {index}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+      if finished and index >= len(task.events):
+        body, _ = task.get_request_return(wait_for_result=False)
+        yield f"event: done\ndata: {json.dumps(body)}\n\n"
+        return
+      if not events: yield ": keepalive\n\n"
+  return Response(stream(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/api/tasks', methods=['GET'])
 def api_list_tasks():
@@ -163,101 +396,211 @@ def api_list_tasks():
       "created_at": task.created_at,
       "started_at": task.started_at,
       "completed_at": task.completed_at,
+      "priority": task.priority,
       "error": task.error
     })
-  return jsonify({"tasks": task_list})
+  return jsonify({"tasks": task_list, "queue_depth": gui.queue_depth()})
+
+@app.route('/api/cancel_task', methods=['GET','POST'])
+def api_cancel_task():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
+  task_id = get_arg_or_param("task_id", type=str)
+  if(not task_id): return jsonify({"error": "task_id parameter is required"}), 400
+  task = Task.get_task(task_id)
+  if(not task): return jsonify({"error": "Task not found"}), 404
+  if(not gui.cancel(task)): return jsonify({"error": f"Task already {task.status.value}"}), 409
+  return jsonify({"message": "Task cancelled" if task.status == TaskStatus.CANCELLED else "Task will stop at its next step", "task_id": task_id})
+
+def submit_gui_task(task:Task, priority:int, timeout:float, coalesce_key:str = None) -> dict:
+  """Queue a task on the GUI executor, returns the task_id fields for the response"""
+  queued = gui.submit(task, priority, timeout, coalesce_key)
+  return {"task_id": queued.task_id, "merged": queued is not task}
+
+def submit_scheduled(function, args:tuple, key:str, timeout:float) -> Task:
+  """Queue a scheduler job behind everything else on the GUI executor"""
+  task = Task.create_task(function, *args)
+  task.name = f"scheduler:{key}"
+  return gui.submit(task, PRIORITY_BULK, timeout, key)
+
+scheduler = CaptureScheduler(findmy, submit_scheduled)
+
+@app.route('/api/scheduler', methods=['GET'])
+def api_scheduler():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  return jsonify(scheduler.status())
+
+@app.route('/api/set_refresh_interval', methods=['GET','POST'])
+def api_set_refresh_interval():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
+  name = get_arg_or_param("name", type=str)
+  if(not name): return jsonify({"error": "name parameter is required"}), 400
+  friend = findmy.find_friend(name)
+  if(not friend): return jsonify({"error": f"Friend '{name}' not found"}), 404
+  interval = get_arg_or_param("interval", type=float) # Seconds, leave out to use the default again
+  if(interval is not None and interval <= 0): return jsonify({"error": "interval must be positive"}), 400
+
+  # Index changes all happen on the GUI thread
+  task = Task.create_task(findmy.set_refresh_interval, friend, interval)
+  return jsonify({"message": f"Setting refresh interval of '{friend}'", **submit_gui_task(task, PRIORITY_INTERACTIVE, 5)})
+
+@app.route('/api/location_history', methods=['GET'])
+def api_location_history():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  name = get_arg_or_param("name", type=str)
+  if(not name): return jsonify({"error": "name parameter is required"}), 400
+  friend = findmy.find_friend(name)
+  if(not friend): return jsonify({"error": f"Friend '{name}' not found"}), 404
+  since = get_arg_or_param("since", type=float)
+  limit = get_arg_or_param("limit", type=int)
+  # format=binary returns the packed samples as stored, SAMPLE_SIZE bytes each
+  if(get_arg_or_param("format", "json", type=str) == "binary"):
+    response = Response(findmy.location_store.raw(friend, since, limit), mimetype="application/octet-stream")
+    response.headers["X-Sample-Format"] = SAMPLE_FORMAT
+    return response
+  return jsonify({"name": friend, "fields": ["time", "x", "y", "confidence"], "samples": findmy.location_store.history(friend, since, limit)})
+
+@app.route('/api/map_wait_times', methods=['GET'])
+def api_map_wait_times():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  return jsonify(findmy.map_wait_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+  """Prometheus text format, step and task timings, HTTP latencies and queue state"""
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/retention', methods=['GET'])
+def api_retention():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  policy = RetentionPolicy.from_config(findmy.config)
+  return jsonify({"enabled": policy.enabled, "last_run": retention.last_run})
+
+@app.route('/api/run_retention', methods=['GET','POST'])
+def api_run_retention():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
+  retention.trigger()
+  return jsonify({"message": "Retention pass started"})
 
 @app.route('/api/sync', methods=['GET','POST'])
 def api_sync():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
   Task.cleanup_old_tasks() # Just put it here for convenience
   task = Task.create_task(findmy.build_index)
-  task_id = task.run_async(30) # 30 second timeout
-  return jsonify({"message": "Index sync started", "task_id": task_id})
+  return jsonify({"message": "Index sync started", **submit_gui_task(task, PRIORITY_SYNC, 120, "sync")}) # 2 minute timeout
 
 @app.route('/api/screenshot_all', methods=['GET','POST'])
 def api_screenshot_all():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
-  def screenshot_all_friends():
-    friends = findmy.get_all_friends()
-    results = {}
-    for friend in friends:
-      try:
-        r = findmy.click_friend(friend.name)
-        if(not r): raise Exception("Failed to select friend")
-        screenshot_path = findmy.screenshot_map()
-        results[friend.name] = {"screenshot": screenshot_path, "error": None}
-      except Exception as e:
-        results[friend.name] = {"screenshot": None, "error": str(e)}
-    return results
-
-  task = Task.create_task(screenshot_all_friends)
-  task_id = task.run_async(300) # 5 minute timeout
-  return jsonify({"message": "Taking screenshots of all friends", "task_id": task_id})
+  if(READ_ONLY): return read_only_error()
+  task = Task.create_task(findmy.capture_friends)
+  return jsonify({"message": "Taking screenshots of all friends", **submit_gui_task(task, PRIORITY_BULK, 300, "screenshot_all")}) # 5 minute timeout
+
+@app.route('/api/screenshot_friends', methods=['GET','POST'])
+def api_screenshot_friends():
+  if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
+  names = get_arg_or_param("names")
+  if(isinstance(names, str)): names = [name.strip() for name in names.split(",") if name.strip()]
+  if(not names or not isinstance(names, list)): return jsonify({"error": "names parameter is required (list or comma separated)"}), 400
+  names = [str(name) for name in names]
+  task = Task.create_task(findmy.capture_friends, names)
+  coalesce_key = "screenshot_friends:" + ",".join(sorted(name.lower() for name in names))
+  return jsonify({"message": f"Taking screenshots of {len(names)} friends", **submit_gui_task(task, PRIORITY_BULK, 300, coalesce_key)}) # 5 minute timeout
 
 @app.route('/api/select_friend', methods=['GET','POST'])
 def api_select_friend():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
   name = get_arg_or_param("name", type=str)
   if(not name): return jsonify({"error": "name parameter is required"}), 400
   friend = findmy.find_friend(name)
   if(not friend): return jsonify({"error": f"Friend '{name}' not found"}), 404
 
   task = Task.create_task(findmy.click_friend, name, True)
-  task_id = task.run_async(30) # 30 second timeout
-  return jsonify({"message": f"Selecting friend '{name}'", "task_id": task_id})
+  return jsonify({"message": f"Selecting friend '{name}'", **submit_gui_task(task, PRIORITY_INTERACTIVE, 30, f"select:{friend}")}) # 30 second timeout
 
 @app.route('/api/take_screenshot', methods=['GET','POST'])
 def api_take_screenshot():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
   task = Task.create_task(findmy.screenshot_map)
-  task_id = task.run_async(5) # 5 second timeout
-  return jsonify({"message": "Taking screenshot", "task_id": task_id})
+  coalesce_key = f"take_screenshot:{findmy.currently_selected_friend}"
+  return jsonify({"message": "Taking screenshot", **submit_gui_task(task, PRIORITY_INTERACTIVE, 5, coalesce_key)}) # 5 second timeout
+
+def send_cacheable_file(path:str, mimetype:str):
+  """send_file with ETag and Last-Modified validators, so unchanged files come back as 304"""
+  response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True, etag=True, last_modified=os.path.getmtime(path))
+  response.cache_control.no_cache = True
+  response.cache_control.private = True
+  return response
 
 @app.route('/api/get_screenshot', methods=['GET','POST'])
 def api_get_screenshot():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
   filename = get_arg_or_param("filename", type=str)
   if(not filename): return jsonify({"error": "filename parameter is required"}), 400
+  if(not FindMy.is_screenshot_name(filename)): return jsonify({"error": "Invalid filename"}), 400
+  size = get_arg_or_param("size", type=int) # Longest side of a thumbnail, full size when not given
+  if(not findmy.wait_for_screenshot(filename)): return jsonify({"error": f"Screenshot '{filename}' failed to save"}), 500
   screenshot_path = os.path.join(findmy.config["screenshot_dir"], filename)
   if(not os.path.exists(screenshot_path)): return jsonify({"error": f"Screenshot '{filename}' not found"}), 404
-  return send_file(screenshot_path, mimetype='image/png')
+  if(size and size > 0):
+    try: thumb = findmy.thumbnail_path(filename, size)
+    except Exception as e: return jsonify({"error": str(e)}), 500
+    if(thumb): return send_cacheable_file(thumb, 'image/jpeg') # Read-only hosts without a cached one send the full image
+  mimetype = MIMETYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
+  return send_cacheable_file(screenshot_path, mimetype)
 
 @app.route('/api/list_screenshots', methods=['GET','POST'])
 def api_list_screenshots():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
   try:
-    screenshot_dir = findmy.config["screenshot_dir"]
-    screenshots = []
-    for filename in os.listdir(screenshot_dir):
-      file_path = os.path.join(screenshot_dir, filename)
-      if os.path.isfile(file_path): screenshots.append((filename, os.path.getmtime(file_path)))
-    return jsonify({"screenshots": screenshots})
+    friend = get_arg_or_param("friend", type=str)
+    if(friend): friend = findmy.find_friend(friend) or friend.lower()
+    limit = min(max(get_arg_or_param("limit", 100, type=int), 1), 1000)
+    screenshots, next_cursor, total = findmy.get_screenshot_catalog().query(
+      friend, get_arg_or_param("since", type=float), get_arg_or_param("until", type=float), limit, get_arg_or_param("cursor", type=str))
+    # Newest first, pass next_cursor back as cursor for the next page
+    return jsonify({"screenshots": screenshots, "next_cursor": next_cursor, "total": total})
+  except InvalidCursor: return jsonify({"error": "invalid cursor"}), 400
   except Exception as e: return jsonify({"error": str(e)}), 500
 
 @app.route('/api/delete_screenshot', methods=['GET','POST'])
 def api_delete_screenshot():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
   try:
     filename = get_arg_or_param("filename", type=str)
     if(not filename): return jsonify({"error": "filename parameter is required"}), 400
+    if(not FindMy.is_screenshot_name(filename)): return jsonify({"error": "Invalid filename"}), 400
     screenshot_path = os.path.join(findmy.config["screenshot_dir"], filename)
     if(not os.path.exists(screenshot_path)): return jsonify({"error": f"Screenshot '{filename}' not found"}), 404
     os.remove(screenshot_path)
+    findmy.get_screenshot_catalog().remove(filename)
+    findmy.prune_screenshot_objects()
     return jsonify({"message": f"Deleted screenshot '{filename}'"})
   except Exception as e: return jsonify({"error": str(e)}), 500
 
 @app.route('/api/delete_all_screenshots', methods=['GET','POST'])
 def api_delete_all_screenshots():
   if(not check_token()): return jsonify({"error": "Invalid API token"}), 403
+  if(READ_ONLY): return read_only_error()
   try:
     screenshot_dir = findmy.config["screenshot_dir"]
+    catalog = findmy.get_screenshot_catalog()
+    catalog.refresh()
     deleted_files = []
-    for filename in os.listdir(screenshot_dir):
-      file_path = os.path.join(screenshot_dir, filename)
-      if os.path.isfile(file_path):
-        os.remove(file_path)
-        deleted_files.append(filename)
+    for filename in catalog.filenames():
+      try: os.remove(os.path.join(screenshot_dir, filename))
+      except FileNotFoundError: pass
+      catalog.remove(filename)
+      deleted_files.append(filename)
+    findmy.prune_screenshot_objects()
     return jsonify({"message": f"Deleted {len(deleted_files)} screenshots", "deleted_files": deleted_files})
   except Exception as e: return jsonify({"error": str(e)}), 500
 
@@ -267,6 +610,19 @@ def serve_static(path):
   except: return "Not Found", 404
 
 if __name__ == '__main__':
+  configure_logging(findmy.config["log_level"])
   findmy.load_index() # Load existing index on startup if available
-  app.run(host='0.0.0.0', port=PORT)
-  print(f"Web host running on port {PORT}")
\ No newline at end of file
+  findmy.get_screenshot_catalog() # Catch the screenshot catalog up with the folder before serving
+  if READ_ONLY: threading.Thread(target=follow_index, daemon=True, name="index-follower").start()
+  else:
+    retention.start()
+    scheduler.start()
+  signal.signal(signal.SIGTERM, lambda *_: sys.exit(0)) # Shut down cleanly below on kill too
+  log.info(f"Web host running on port {PORT}")
+  try: app.run(host='0.0.0.0', port=PORT)
+  finally:
+    # Journal updates still waiting for their flush timer, the catalog and the OCR pool
+    scheduler.stop()
+    retention.stop()
+    findmy.shutdown()
+    log.info("Web host stopped")
\ No newline at end of file